@@ -1,3 +1,7 @@
 from .main import ParquetMain
 from .reader import ParquetReader
-from .filesystem import BaseFileSystem, LocalFileSystem
+from .filesystem import (AsyncBaseFileSystem, AsyncFileSystemAdapter,
+                         BaseFileSystem, HTTPFileSystem, LocalFileSystem,
+                         MappedFile)
+from .async_reader import AsyncParquetReader
+from .cache import BlockCache, CachingFileSystem, FooterCache
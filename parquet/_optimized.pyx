@@ -1,13 +1,74 @@
 from libc.stdio cimport *
 from cpython cimport array
 from libc.stdlib cimport malloc, free
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.unicode cimport PyUnicode_DecodeUTF8
 import array
 import struct
 
-
-cdef extern from "optimized.h":
-    int read_bitpacked_internal(void *data, int data_len, int mask, int* res, int total, int bit_width);
-    long read_litle_endian_int(unsigned char *data);
+import numpy as np
+
+
+cdef extern from "optimized.h" nogil:
+    int read_bitpacked_internal(const unsigned char *data, int data_len, int* res, int bit_width);
+    int unpack_bits_msb(const unsigned char *data, int data_len, int bit_width, int *res, int count);
+    long read_litle_endian_int(const unsigned char *data);
+    int count_rle_bit_packed_hybrid(const unsigned char *data, int data_len, int bit_width);
+    int read_rle_bit_packed_hybrid_internal(const unsigned char *data, int data_len, int bit_width, int *res, int total);
+    long long scan_byte_array_lengths(const unsigned char *data, long long data_len, int count, long long *offsets);
+    void gather_byte_array(const unsigned char *data, int count, const long long *offsets, unsigned char *out);
+    void take_byte_array(const unsigned char *data, long long count, const long long *starts, const long long *offsets, unsigned char *out);
+    int read_delta_binary_packed_count(const unsigned char *data, long long data_len);
+    long long read_delta_binary_packed_internal(const unsigned char *data, long long data_len, long long *out, int count);
+    int read_delta_byte_array_internal(const long long *prefix_lengths, const unsigned char *suffix_data, const long long *suffix_offsets, int count, unsigned char *out, long long *offsets);
+
+
+def byte_array_to_objects(data, offsets, encoding=None):
+    """Creates an object array holding the values described by a contiguous
+    data buffer and an offsets array, as bytes or decoded with encoding."""
+    cdef const unsigned char[::1] raw = data
+    cdef const long long[::1] offs = np.ascontiguousarray(offsets,
+                                                          dtype=np.longlong)
+    cdef Py_ssize_t n = offs.shape[0] - 1
+    cdef Py_ssize_t i
+    cdef bint utf8 = encoding is not None and encoding.lower() in ('utf-8', 'utf8')
+    cdef const char *base = b""
+    if raw.shape[0] > 0:
+        base = <const char *>&raw[0]
+    out = np.empty(max(n, 0), dtype=object)
+    cdef object[:] res = out
+    for i in range(n):
+        if utf8:
+            res[i] = PyUnicode_DecodeUTF8(base + offs[i], offs[i + 1] - offs[i],
+                                          NULL)
+            continue
+        value = PyBytes_FromStringAndSize(base + offs[i], offs[i + 1] - offs[i])
+        if encoding is not None:
+            value = value.decode(encoding)
+        res[i] = value
+    return out
+
+
+def take_byte_array_values(data, offsets, indices):
+    """Gathers the values at the given indices of a contiguous data buffer
+    and its offsets array into a new buffer, returning it with its offsets.
+    Only the offsets are computed per value in numpy; the bytes are copied
+    in C."""
+    offsets = np.asarray(offsets, dtype=np.longlong)
+    starts = np.ascontiguousarray(offsets[:-1][indices], dtype=np.longlong)
+    new_offsets = np.zeros(starts.shape[0] + 1, dtype=np.longlong)
+    np.cumsum(offsets[1:][indices] - starts, out=new_offsets[1:])
+    values = np.empty(new_offsets[-1], dtype=np.uint8)
+    if values.shape[0] == 0:
+        return values, new_offsets
+    cdef const unsigned char[::1] raw = np.ascontiguousarray(data)
+    cdef const long long[::1] starts_view = starts
+    cdef const long long[::1] offs = new_offsets
+    cdef unsigned char[::1] out = values
+    with nogil:
+        take_byte_array(&raw[0], starts_view.shape[0], &starts_view[0],
+                        &offs[0], &out[0])
+    return values, new_offsets
 
 
 cdef class BinaryReader:
@@ -17,16 +78,11 @@ cdef class BinaryReader:
 
     cdef array.array _array
     cdef int _array_size
-    cdef bytes _zero_data
-    cdef array.array _boolean_array
 
     def __init__(self):
         # Initialize array size to something reasonable
         self._array_size = 0
         self._ensure_array(10240)
-        self._zero_data = b"\x00\x00\x00\x00"
-
-        self._boolean_array = None
 
     def __del__(self):
         self._array = None
@@ -37,26 +93,6 @@ cdef class BinaryReader:
         self._array = array.array('i', [0] * size)
         self._array_size = size
 
-    def filter_values(self, dictionary, values, definition_levels):
-        # We need to do masking for which are null.
-        dsize = len(definition_levels)
-        vsize = len(values)
-        if dsize <= vsize and sum(definition_levels) == dsize:
-            # no missing, can optimize
-            return list(map(lambda x: dictionary[x], values))[:dsize]
-        else:
-            all_values = list(map(lambda x: dictionary[x], values))
-
-            def _gen():
-
-                viter = iter(all_values)
-                for ind in definition_levels:
-                    if ind == 0:
-                        yield None
-                    else:
-                        yield next(viter)
-            return list(_gen())[:dsize]
-
     def read_unsigned_var_int(self, fo):
         result = 0
         shift = 0
@@ -69,48 +105,213 @@ cdef class BinaryReader:
         return result
 
 
-    def read_bitpacked_data(self, data, mask, width):
+    def read_bitpacked_data(self, data, width):
 
-        cdef bytes py_bytes = data
+        cdef bytes py_bytes = bytes(data)
         cdef int bit_width = width
-        cdef int data_mask = mask
-        cdef char * py_raw = py_bytes
+        cdef unsigned char * py_raw = py_bytes
 
         total = len(data) * 8
         self._ensure_array(total)
         cdef int* native =  &self._array.data.as_ints[0]
-        size = read_bitpacked_internal(py_raw, total, data_mask, native, total, bit_width)
+        size = read_bitpacked_internal(py_raw, len(py_bytes), native, bit_width)
         return self._array[:size]
 
+    def read_bitpacked_deprecated(self, data, int bit_width, int count):
+        """Decodes count values of the deprecated, most significant bit first
+        BIT_PACKED encoding into an int32 numpy array."""
+        cdef const unsigned char[::1] raw = data
+        cdef int data_len = raw.shape[0]
+        out = np.zeros(count, dtype=np.intc)
+        if count == 0 or data_len == 0:
+            return out[:0]
+        cdef int[::1] res = out
+        cdef int size
+        with nogil:
+            size = unpack_bits_msb(&raw[0], data_len, bit_width, &res[0],
+                                   count)
+        if size < 0:
+            raise ValueError("Unsupported bit width {0}".format(bit_width))
+        if size < count:
+            return out[:size]
+        return out
+
+    def read_rle_bit_packed_hybrid(self, data, int bit_width, count=None):
+        """Decodes a buffer of rle/bit-packed hybrid encoded data into an int32
+        numpy array.
+
+        At most count values are decoded; by default every value in the buffer
+        is. The result is shorter than count if the data runs out first.
+        """
+        cdef const unsigned char[::1] raw = data
+        cdef int data_len = raw.shape[0]
+        cdef int total
+        if data_len == 0:
+            return np.zeros(0, dtype=np.intc)
+        if count is None:
+            with nogil:
+                total = count_rle_bit_packed_hybrid(&raw[0], data_len,
+                                                    bit_width)
+            if total < 0:
+                raise ValueError("Corrupt rle/bit-packed hybrid data")
+        else:
+            total = count
+        out = np.empty(total, dtype=np.intc)
+        if total == 0:
+            return out
+        cdef int[::1] res = out
+        cdef int size
+        with nogil:
+            size = read_rle_bit_packed_hybrid_internal(
+                &raw[0], data_len, bit_width, &res[0], total)
+        if size < 0:
+            raise ValueError("Corrupt rle/bit-packed hybrid data")
+        if size < total:
+            return out[:size]
+        return out
+
     def read_rle(self, fo, header, width):
         count = header >> 1
         data = fo.read(width)
-        data = data + self._zero_data[len(data):]
-        value = struct.unpack("<i", data)[0]
+        if len(data) != width:
+            raise ValueError("Expected {0} bytes for an rle run value".format(
+                width))
+        value = int.from_bytes(data, 'little')
         return [ value for i in range(count)]
 
-    def read_plain_boolean(self, fo, fixed_length=None):
-        """Reads a boolean using the plain encoding"""
-        size = 1 # 1 byte
-        mask = 1 # 00000001
-        width = 1 # 1 bit
+    def read_plain_boolean_array(self, fo, count):
+        """Reads count booleans using the plain encoding, returning a numpy
+        bool array.
 
-        if not self._boolean_array:
-            data = fo.read(size)
-            self._boolean_array = self.read_bitpacked_data(data, mask, width)
+        The whole bit-packed run is unpacked at once, so no state is carried
+        over between calls.
+        """
+        py_bytes = fo.read((count + 7) // 8)
+        bits = np.unpackbits(np.frombuffer(py_bytes, dtype=np.uint8),
+                             count=count, bitorder='little')
+        return bits.view(np.bool_)
 
-        value = self._boolean_array.pop(0)
-        return value == 1
+
+    def read_plain_boolean(self, fo, fixed_length=None):
+        """Reads a single boolean using the plain encoding, from the low bit
+        of the next byte.
+
+        No state is kept between calls; use read_plain_boolean_array to
+        decode a whole page.
+        """
+        return bool(self.read_plain_boolean_array(fo, 1)[0])
+
+
+    def read_plain_array(self, fo, dtype, count):
+        """Reads count fixed-width values using the plain encoding, returning
+        them as a numpy array of the given (little endian) dtype.
+
+        The bytes are reinterpreted in place, so no per-value work is done.
+        """
+        dtype = np.dtype(dtype)
+        py_bytes = fo.read(dtype.itemsize * count)
+        return np.frombuffer(py_bytes, dtype=dtype, count=count)
+
+
+    def read_plain_byte_array_page(self, data, int count):
+        """Decodes count plain encoded byte arrays from the start of data.
+
+        Returns a tuple of a uint8 array holding the values back to back, an
+        int64 array of count + 1 offsets into it, and the number of bytes of
+        data that were consumed.
+        """
+        offsets = np.zeros(count + 1, dtype=np.longlong)
+        if count == 0:
+            return np.zeros(0, dtype=np.uint8), offsets, 0
+        cdef const unsigned char[::1] raw = data
+        cdef long long[::1] offs = offsets
+        cdef long long consumed = -1
+        if raw.shape[0] > 0:
+            with nogil:
+                consumed = scan_byte_array_lengths(&raw[0], raw.shape[0],
+                                                   count, &offs[0])
+        if consumed < 0:
+            raise ValueError("Byte array data is shorter than expected")
+        values = np.empty(offs[count], dtype=np.uint8)
+        cdef unsigned char[::1] out = values
+        if offs[count] > 0:
+            with nogil:
+                gather_byte_array(&raw[0], count, &offs[0], &out[0])
+        return values, offsets, consumed
+
+
+    def read_delta_binary_packed(self, data):
+        """Decodes DELTA_BINARY_PACKED encoded integers from the start of data.
+
+        Returns a tuple of an int64 array with the values and the number of
+        bytes of data that were consumed.
+        """
+        cdef const unsigned char[::1] raw = data
+        cdef long long data_len = raw.shape[0]
+        cdef int count = -1
+        cdef long long consumed
+        if data_len > 0:
+            with nogil:
+                count = read_delta_binary_packed_count(&raw[0], data_len)
+        if count < 0:
+            raise ValueError("Corrupt DELTA_BINARY_PACKED data")
+        values = np.empty(count, dtype=np.longlong)
+        if count == 0:
+            consumed = read_delta_binary_packed_internal(&raw[0], data_len,
+                                                         NULL, 0)
+            return values, consumed
+        cdef long long[::1] out = values
+        with nogil:
+            consumed = read_delta_binary_packed_internal(&raw[0], data_len,
+                                                         &out[0], count)
+        if consumed < 0:
+            raise ValueError("Corrupt DELTA_BINARY_PACKED data")
+        # out holds the first value followed by the deltas
+        np.cumsum(values, out=values)
+        return values, consumed
+
+
+    def read_delta_byte_array(self, prefix_lengths, suffix_data, suffix_offsets):
+        """Rebuilds DELTA_BYTE_ARRAY values from their prefix lengths and
+        suffixes, returning the values back to back in a uint8 array together
+        with their offsets."""
+        cdef const long long[::1] prefixes = np.ascontiguousarray(
+            prefix_lengths, dtype=np.longlong)
+        cdef const long long[::1] suffix_offs = np.ascontiguousarray(
+            suffix_offsets, dtype=np.longlong)
+        cdef int count = prefixes.shape[0]
+        if suffix_offs.shape[0] != count + 1:
+            raise ValueError("Expected {0} DELTA_BYTE_ARRAY suffixes".format(count))
+        offsets = np.zeros(count + 1, dtype=np.longlong)
+        total = int(np.sum(prefix_lengths)) + int(suffix_offs[count] - suffix_offs[0])
+        values = np.empty(total, dtype=np.uint8)
+        if count == 0 or total == 0:
+            return values, offsets
+        cdef const unsigned char[::1] suffixes = suffix_data
+        cdef const unsigned char *suffix_ptr = b""
+        if suffixes.shape[0] > 0:
+            suffix_ptr = &suffixes[0]
+        cdef unsigned char[::1] out = values
+        cdef long long[::1] offs = offsets
+        cdef int status
+        with nogil:
+            status = read_delta_byte_array_internal(
+                &prefixes[0], suffix_ptr, &suffix_offs[0], count, &out[0],
+                &offs[0])
+        if status < 0:
+            raise ValueError("Corrupt DELTA_BYTE_ARRAY prefix lengths")
+        return values, offsets
 
 
     def read_plain_int32(self, fo, fixed_length=None):
         """Reads a 32-bit int using the plain encoding"""
-        cdef bytes py_bytes = fo.read(4)
+        cdef const unsigned char[::1] raw = fo.read(4)
+        if raw.shape[0] != 4:
+            raise EOFError("Expected 4 bytes for an int32")
 #if PY_LITTLE_ENDIAN
-        cdef unsigned char * py_raw = py_bytes
-        return read_litle_endian_int(py_raw)
+        return read_litle_endian_int(&raw[0])
 #else
-        tup = struct.unpack("<i", py_bytes)
+        tup = struct.unpack("<i", raw)
         return tup[0]
 #endif
 
@@ -143,10 +344,9 @@ cdef class BinaryReader:
     def read_plain_byte_array(self, fo, fixed_length=None):
         """Reads a byte array using the plain encoding"""
         length = self.read_plain_int32(fo)
-        cdef bytes py_bytes = fo.read(length)
-        return py_bytes.decode('utf-8')
+        return str(fo.read(length), 'utf-8')
 
 
     def read_plain_byte_array_fixed(self, fo, fixed_length):
         """Reads a byte array of the given fixed_length"""
-        return fo.read(fixed_length).decode('utf-8')
+        return bytes(fo.read(fixed_length))
@@ -0,0 +1,384 @@
+"""Columnar containers for values that do not fit in a flat numpy array."""
+
+import numpy as np
+import pandas as pd
+
+import parquet._optimized
+
+
+def fill_nulls(values, valid):
+    """Spreads the non-null values out to the positions flagged in valid.
+
+    Numeric, boolean and fixed-width binary ('S' or structured INT96) values
+    are scattered into a preallocated array that is returned as a numpy
+    masked array, masked where valid is false; other values are filled out
+    with None.
+    """
+    if isinstance(values, ByteArray):
+        return values.with_nulls(valid)
+    values = np.asarray(values)
+    if values.dtype.kind in 'biufSV':
+        out = np.zeros(len(valid), dtype=values.dtype)
+        out[valid] = values
+        return np.ma.MaskedArray(out, mask=~valid)
+    out = np.empty(len(valid), dtype=object)
+    out[valid] = values
+    return out
+
+
+def to_pandas(values, mask):
+    """Returns values as a pandas array with the positions flagged in mask
+    set to null. Integer, float and boolean values get pandas' nullable
+    (masked) dtypes rather than being cast to float or object."""
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if kind in 'iu':
+        return pd.arrays.IntegerArray(values, mask)
+    if kind == 'f':
+        return pd.arrays.FloatingArray(values, mask)
+    if kind == 'b':
+        return pd.arrays.BooleanArray(values, mask)
+    if kind in 'Mm':
+        return pd.Series(values).mask(mask).array
+    out = values.astype(object)
+    out[mask] = None
+    return out
+
+
+def take(values, indices):
+    """Returns the values at the given indices of a numpy array or
+    ByteArray."""
+    if isinstance(values, ByteArray):
+        return values.take(indices)
+    return np.asarray(values)[indices]
+
+
+def concat(arrays):
+    """Joins several numpy arrays, masked arrays, ByteArrays or ListArrays of
+    the same kind into one."""
+    if len(arrays) == 1:
+        return arrays[0]
+    if isinstance(arrays[0], (ByteArray, ListArray)):
+        return type(arrays[0]).concat(arrays)
+    if any(isinstance(a, np.ma.MaskedArray) for a in arrays):
+        return np.ma.concatenate(arrays)
+    return np.concatenate(arrays)
+
+
+class ByteArray(object):
+    """Variable length binary values held as one contiguous data buffer and an
+    offsets array: value i is data[offsets[i]:offsets[i + 1]].
+
+    Python bytes or str objects are only created by to_numpy, tolist and
+    item access. An optional boolean mask flags null values.
+    """
+
+    def __init__(self, data, offsets, mask=None):
+        self.data = data
+        self.offsets = offsets
+        self.mask = mask
+
+    @classmethod
+    def from_values(cls, values):
+        """Builds a ByteArray from a sequence of bytes objects."""
+        values = list(values)
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64,
+                              count=len(values))
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.frombuffer(b"".join(values), dtype=np.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def from_fixed(cls, values):
+        """Wraps an array of fixed-width values, e.g. of dtype 'S<n>', as a
+        ByteArray sharing its memory. Unlike indexing an 'S' array, this keeps
+        trailing null bytes."""
+        values = np.ascontiguousarray(values)
+        width = values.dtype.itemsize
+        offsets = np.arange(0, width * (len(values) + 1), width, dtype=np.int64)
+        return cls(values.view(np.uint8), offsets)
+
+    @classmethod
+    def concat(cls, arrays):
+        """Joins several ByteArrays into one."""
+        datas = []
+        offsets = [np.zeros(1, dtype=np.int64)]
+        masks = []
+        end = 0
+        for a in arrays:
+            datas.append(a.data[a.offsets[0]:a.offsets[-1]])
+            offsets.append(a.offsets[1:] - a.offsets[0] + end)
+            end += a.offsets[-1] - a.offsets[0]
+            masks.append(a.mask if a.mask is not None
+                         else np.zeros(len(a), dtype=bool))
+        mask = None
+        if any(a.mask is not None for a in arrays):
+            mask = np.concatenate(masks)
+        data = np.concatenate(datas) if datas else np.zeros(0, dtype=np.uint8)
+        return cls(data, np.concatenate(offsets), mask)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self.take(np.arange(start, stop, step))
+            stop = max(start, stop)
+            mask = self.mask[start:stop] if self.mask is not None else None
+            return ByteArray(self.data, self.offsets[start:stop + 1], mask)
+        if isinstance(key, (np.ndarray, list)):
+            key = np.asarray(key)
+            if key.dtype == bool:
+                key = np.flatnonzero(key)
+            return self.take(key)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("ByteArray index out of range")
+        if self.mask is not None and self.mask[key]:
+            return None
+        return self.data[self.offsets[key]:self.offsets[key + 1]].tobytes()
+
+    def __repr__(self):
+        return "ByteArray({!r})".format(self.tolist())
+
+    def lengths(self):
+        """Returns the length in bytes of every value."""
+        return np.diff(self.offsets)
+
+    def take(self, indices):
+        """Returns a new ByteArray with the values at the given indices."""
+        indices = np.asarray(indices, dtype=np.intp)
+        data, offsets = parquet._optimized.take_byte_array_values(
+            self.data, self.offsets, indices)
+        mask = self.mask[indices] if self.mask is not None else None
+        return ByteArray(data, offsets, mask)
+
+    def with_nulls(self, valid):
+        """Spreads the values out to the positions flagged in valid, leaving
+        the remaining positions null."""
+        lengths = np.zeros(len(valid), dtype=np.int64)
+        lengths[valid] = self.lengths()
+        offsets = np.empty(len(valid) + 1, dtype=np.int64)
+        offsets[0] = self.offsets[0]
+        np.cumsum(lengths, out=offsets[1:])
+        offsets[1:] += self.offsets[0]
+        return ByteArray(self.data, offsets, ~np.asarray(valid, dtype=bool))
+
+    def to_numpy(self, encoding=None):
+        """Returns an object array of bytes, or of str decoded with encoding.
+        Null values become None."""
+        out = parquet._optimized.byte_array_to_objects(
+            self.data, self.offsets, encoding)
+        if self.mask is not None:
+            out[self.mask] = None
+        return out
+
+    def tolist(self, encoding=None):
+        return self.to_numpy(encoding).tolist()
+
+
+class DictionaryArray(object):
+    """Dictionary encoded values: an int32 array of indices into a dictionary
+    (numpy array or ByteArray) of distinct values. Nulls have index -1.
+    """
+
+    def __init__(self, indices, dictionary):
+        self.indices = indices
+        self.dictionary = dictionary
+
+    @classmethod
+    def concat(cls, arrays):
+        """Joins several DictionaryArrays into one, merging their dictionaries
+        if they differ. Only the dictionaries are looked at value by value;
+        the indices are remapped with one vectorized lookup per array."""
+        dictionaries = []
+        for a in arrays:
+            if not any(a.dictionary is d or _same_values(a.dictionary, d)
+                       for d in dictionaries):
+                dictionaries.append(a.dictionary)
+        if len(dictionaries) == 1:
+            return cls(np.concatenate([a.indices for a in arrays]),
+                       dictionaries[0])
+
+        merged = pd.unique(np.concatenate(
+            [_dictionary_values(d) for d in dictionaries]))
+        index = pd.Index(merged)
+        indices = []
+        for a in arrays:
+            mapping = index.get_indexer(_dictionary_values(a.dictionary))
+            # the trailing -1 keeps null indices (-1) null
+            mapping = np.append(mapping, -1).astype(np.int32)
+            indices.append(mapping[a.indices])
+        dictionary = merged
+        if isinstance(dictionaries[0], ByteArray):
+            dictionary = ByteArray.from_values(merged)
+        return cls(np.concatenate(indices), dictionary)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return DictionaryArray(self.indices[key], self.dictionary)
+        index = self.indices[key]
+        return None if index < 0 else self.dictionary[index]
+
+    def decode(self):
+        """Returns the values the indices refer to, with None for nulls."""
+        valid = self.indices >= 0
+        if valid.all():
+            return take(self.dictionary, self.indices)
+        return fill_nulls(take(self.dictionary, self.indices[valid]), valid)
+
+    def tolist(self):
+        return self.decode().tolist()
+
+
+class ListArray(object):
+    """Lists of variable length held as an offsets array into a flat values
+    array: list i is values[offsets[i]:offsets[i + 1]]. The values may
+    themselves be a ListArray for lists of lists.
+
+    Python lists are only created by to_numpy, tolist and item access. An
+    optional boolean mask flags null lists.
+    """
+
+    def __init__(self, offsets, values, mask=None):
+        self.offsets = offsets
+        self.values = values
+        self.mask = mask
+
+    @classmethod
+    def from_levels(cls, repetition_levels, definition_levels, list_levels,
+                    values, max_definition_level):
+        """Assembles the non-null leaf values of a column back into (nested)
+        lists from its repetition and definition levels.
+
+        list_levels holds the (parent definition level, definition level)
+        pair of every repeated field, as given by SchemaHelper.list_levels.
+        Each nesting level is built with a few vectorized scans over the
+        levels, innermost first.
+        """
+        repetition_levels = np.asarray(repetition_levels)
+        definition_levels = np.asarray(definition_levels)
+        # every element of the innermost lists is a leaf value or a null
+        elements = definition_levels >= list_levels[-1][1]
+        valid = definition_levels[elements] == max_definition_level
+        if not valid.all():
+            values = fill_nulls(values, valid)
+        for level in range(len(list_levels), 0, -1):
+            parent_level, list_level = list_levels[level - 1]
+            outer_level = list_levels[level - 2][1] if level > 1 else 0
+            # a lower repetition level starts a new list, for every element
+            # of the enclosing lists (or every record at the top)
+            starts = np.flatnonzero((repetition_levels < level) &
+                                    (definition_levels >= outer_level))
+            elements = (repetition_levels <= level) & \
+                (definition_levels >= list_level)
+            counts = np.zeros(len(elements) + 1, dtype=np.int64)
+            np.cumsum(elements, out=counts[1:])
+            offsets = np.append(counts[starts], counts[-1])
+            mask = definition_levels[starts] < parent_level
+            values = cls(offsets, values, mask if mask.any() else None)
+        return values
+
+    @classmethod
+    def concat(cls, arrays):
+        """Joins several ListArrays into one."""
+        values = []
+        offsets = [np.zeros(1, dtype=np.int64)]
+        masks = []
+        end = 0
+        for a in arrays:
+            values.append(a.values[a.offsets[0]:a.offsets[-1]])
+            offsets.append(a.offsets[1:] - a.offsets[0] + end)
+            end += a.offsets[-1] - a.offsets[0]
+            masks.append(a.mask if a.mask is not None
+                         else np.zeros(len(a), dtype=bool))
+        mask = None
+        if any(a.mask is not None for a in arrays):
+            mask = np.concatenate(masks)
+        return cls(np.concatenate(offsets), concat(values), mask)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("ListArray slices must be contiguous")
+            stop = max(start, stop)
+            mask = self.mask[start:stop] if self.mask is not None else None
+            return ListArray(self.offsets[start:stop + 1], self.values, mask)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("ListArray index out of range")
+        if self.mask is not None and self.mask[key]:
+            return None
+        return self[key:key + 1].tolist()[0]
+
+    def __repr__(self):
+        return "ListArray({!r})".format(self.tolist())
+
+    def lengths(self):
+        """Returns the length of every list."""
+        return np.diff(self.offsets)
+
+    def flat_values(self):
+        """Returns the leaf values below all levels of nesting."""
+        values = self.values
+        while isinstance(values, ListArray):
+            values = values.values
+        return values
+
+    def with_flat_values(self, flat_values):
+        """Returns a ListArray with the same nesting around other leaf values,
+        e.g. the leaf values converted to their logical type."""
+        values = flat_values
+        if isinstance(self.values, ListArray):
+            values = self.values.with_flat_values(flat_values)
+        return ListArray(self.offsets, values, self.mask)
+
+    def to_numpy(self):
+        """Returns an object array of Python lists. Null lists become
+        None."""
+        start, stop = self.offsets[0], self.offsets[-1]
+        items = self.values[start:stop].tolist()
+        offsets = (self.offsets - start).tolist()
+        out = np.empty(len(self), dtype=object)
+        for i in range(len(self)):
+            out[i] = items[offsets[i]:offsets[i + 1]]
+        if self.mask is not None:
+            out[self.mask] = None
+        return out
+
+    def tolist(self):
+        return self.to_numpy().tolist()
+
+
+def _dictionary_values(dictionary):
+    if isinstance(dictionary, ByteArray):
+        return dictionary.to_numpy()
+    return np.asarray(dictionary)
+
+
+def _same_values(a, b):
+    if type(a) is not type(b) or len(a) != len(b):
+        return False
+    if isinstance(a, ByteArray):
+        return np.array_equal(a.lengths(), b.lengths()) and np.array_equal(
+            a.data[a.offsets[0]:a.offsets[-1]],
+            b.data[b.offsets[0]:b.offsets[-1]])
+    return np.array_equal(a, b)
@@ -0,0 +1,160 @@
+"""An asyncio reader, fetching footers and column chunks concurrently."""
+import asyncio
+import functools
+import os.path
+
+from parquet.cache import default_footer_cache
+from parquet.filesystem import (AsyncFileSystemAdapter, BaseFileSystem,
+                                LocalFileSystem)
+from parquet.main import (ParquetMain, footer_in_tail, footer_range,
+                          footer_tail_range)
+from parquet.reader import ParquetReader
+
+
+# requests each reader has in flight at most, unless given a semaphore
+DEFAULT_CONCURRENCY = 16
+
+
+class _Prefetched(BaseFileSystem):
+    """The file system of the ParquetReader behind an AsyncParquetReader,
+    which fetches everything it reads beforehand."""
+
+    def __init__(self, directory):
+        self._directory = directory
+
+    def open(self, path, mode='rb'):
+        raise IOError("{0} hasn't been fetched".format(path))
+
+    def is_dir(self, path):
+        return self._directory
+
+
+class AsyncParquetReader(object):
+    """Reads a parquet file (or a directory with a _metadata file) from an
+    AsyncBaseFileSystem. A blocking BaseFileSystem is run on the event loop's
+    executor; by default local files are read.
+
+    Create one with ``await AsyncParquetReader.open(path)``. read fetches
+    the column chunks it needs concurrently, holding semaphore for each
+    request, then decodes them on executor so the event loop isn't blocked.
+    Readers sharing a semaphore share its bound, which is how many files are
+    read at once without flooding the file system (see read_files). A reader
+    mustn't be read from concurrently.
+
+    Footers are looked up in footer_cache (shared by default; None disables
+    it) by the path and version of the file, like ParquetReader does.
+    """
+
+    def __init__(self, path, fs=None, executor=None, semaphore=None,
+                 footer_cache=default_footer_cache):
+        if fs is None:
+            fs = LocalFileSystem()
+        if isinstance(fs, BaseFileSystem):
+            fs = AsyncFileSystemAdapter(fs)
+        self._path = path
+        self._fs = fs
+        self._executor = executor
+        self._semaphore = semaphore or asyncio.Semaphore(DEFAULT_CONCURRENCY)
+        self._footer_cache = footer_cache
+        self._reader = None
+
+    @classmethod
+    async def open(cls, path, fs=None, executor=None, semaphore=None,
+                   footer_cache=default_footer_cache):
+        """Returns a reader of path, once its footer has been read."""
+        reader = cls(path, fs, executor, semaphore, footer_cache)
+        await reader._open()
+        return reader
+
+    async def _open(self):
+        directory = await self._fs.is_dir(self._path)
+        filename = self._path
+        if directory:
+            filename = os.path.join(self._path, "_metadata")
+        async with self._semaphore:
+            size, version = await self._fs.size_and_version(filename)
+        key = (filename, version)
+        cached = None
+        if self._footer_cache is not None:
+            cached = self._footer_cache.get(key)
+        if cached is None:
+            cached = await self._read_footer(filename, size)
+            if self._footer_cache is not None:
+                self._footer_cache.put(key, cached)
+        footer, footer_offset = cached
+        self._reader = ParquetReader(self._path, fs=_Prefetched(directory),
+                                     footer=footer,
+                                     footer_offset=footer_offset)
+
+    async def _read_footer(self, filename, size):
+        """Returns the footer and the offset it starts at. The end of the file
+        is read in one request, and the footer again only if it is larger than
+        FOOTER_READ_SIZE."""
+        tail, = await self._read_ranges(filename, [footer_tail_range(size)])
+        footer = footer_range(filename, size, tail)
+        footer_bytes = footer_in_tail(size, tail, footer)
+        if footer_bytes is None:
+            footer_bytes, = await self._read_ranges(filename, [footer])
+        return (await self._run(ParquetMain().parse_footer, footer_bytes),
+                footer[0])
+
+    async def read(self, columns=None, rows=None, categorical=False,
+                   unscaled_decimals=False):
+        """Reads rows into a pandas DataFrame, like ParquetReader.read.
+
+        The column chunks of every row group needed are fetched first; with
+        rows, that may be one row group more than is decoded.
+        """
+        reader = self._reader
+        wanted = set(columns or reader._cols)
+        fetches = []
+        # the current row group may have been partly read already
+        remaining = rows
+        for index in range(reader._row_group_index, len(reader._rg)):
+            if remaining is not None and remaining <= 0:
+                break
+            rg = reader._rg[index]
+            cols = [col for col in rg.columns
+                    if reader._get_column_info(col)[0] in wanted]
+            for file_name, chunks in reader._chunk_ranges(index, cols).items():
+                fetches.append(self._fetch(reader._file_path(file_name),
+                                           chunks))
+            if remaining is not None and index > reader._row_group_index:
+                remaining -= rg.num_rows
+        await asyncio.gather(*fetches)
+        return await self._run(functools.partial(
+            reader.read, columns, rows, categorical=categorical,
+            unscaled_decimals=unscaled_decimals))
+
+    async def _fetch(self, path, chunks):
+        views = await self._read_ranges(path, [r for _, r in chunks])
+        for (key, _), view in zip(chunks, views):
+            self._reader._chunks[key] = view
+
+    async def _read_ranges(self, path, ranges):
+        async with self._semaphore:
+            return await self._fs.read_ranges(path, ranges)
+
+    def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, fn, *args)
+
+    def close(self):
+        self._reader.close()
+
+
+async def read_files(paths, fs=None, executor=None, max_concurrency=64,
+                     **kwargs):
+    """Reads the parquet files at paths concurrently, with at most
+    max_concurrency requests in flight across all of them. Returns a
+    DataFrame for each file; kwargs are passed to AsyncParquetReader.read."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def read_file(path):
+        reader = await AsyncParquetReader.open(path, fs, executor, semaphore)
+        try:
+            return await reader.read(**kwargs)
+        finally:
+            reader.close()
+
+    return await asyncio.gather(*[read_file(path) for path in paths])
@@ -0,0 +1,76 @@
+"""Reusable scratch buffers for decompressing pages."""
+import io
+import threading
+
+import numpy as np
+
+
+class BufferPool(object):
+    """Hands out scratch buffers, returning released ones to later callers
+    instead of allocating a new buffer for every page.
+
+    Buffers are numpy uint8 arrays (which, unlike bytearrays, aren't zero
+    filled), rounded up to a power of two so pages of similar sizes can share
+    them. At most max_buffers released buffers are kept.
+    """
+
+    def __init__(self, max_buffers=8):
+        self._free = []
+        self._max_buffers = max_buffers
+        self._lock = threading.Lock()
+
+    def get(self, size):
+        """Returns a writable memoryview of exactly size bytes."""
+        with self._lock:
+            for i, buf in enumerate(self._free):
+                if len(buf) >= size:
+                    del self._free[i]
+                    return memoryview(buf)[:size]
+        capacity = 1 << max(size - 1, 0).bit_length()
+        return memoryview(np.empty(capacity, dtype=np.uint8))[:size]
+
+    def release(self, view):
+        """Returns a buffer handed out by get to the pool."""
+        buf = view.obj
+        with self._lock:
+            if len(self._free) < self._max_buffers:
+                self._free.append(buf)
+                self._free.sort(key=len)
+
+
+class BufferReader(object):
+    """A read-only file-like cursor over a bytes-like object. read returns
+    memoryview slices, so nothing is copied.
+
+    stable is false if the underlying buffer will be reused once the page is
+    decoded; decoders then copy any values that would otherwise be views into
+    it.
+    """
+
+    def __init__(self, data, stable=True):
+        self._view = memoryview(data)
+        self._pos = 0
+        self.stable = stable
+
+    def read(self, size=-1):
+        start = self._pos
+        if size is None or size < 0:
+            self._pos = len(self._view)
+        else:
+            self._pos = min(start + size, len(self._view))
+        return self._view[start:self._pos]
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def getbuffer(self):
+        """Returns the whole underlying buffer, like BytesIO.getbuffer."""
+        return self._view
@@ -0,0 +1,284 @@
+"""Caches of file contents and footers shared by the readers of a process."""
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+from parquet.filesystem import BaseFileSystem
+
+
+class BlockCache(object):
+    """An LRU cache of file blocks holding at most max_bytes.
+
+    If spill_dir is given, blocks evicted from memory are written to files in
+    it, up to spill_max_bytes, and read back (into memory) when they are hit.
+    hits, spill_hits, misses and evictions count block lookups and blocks
+    dropped from memory.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, spill_dir=None,
+                 spill_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._blocks = OrderedDict()
+        self._bytes = 0
+        self._spilled = OrderedDict()
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the block with the given key, or None if it isn't
+        cached."""
+        with self._lock:
+            data = self._blocks.get(key)
+            if data is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return data
+            if key in self._spilled:
+                data = self._unspill(key)
+                if data is not None:
+                    self.spill_hits += 1
+                    self._add(key, data)
+                    return data
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Caches the block (bytes) with the given key."""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._add(key, data)
+
+    def stats(self):
+        """Returns the counters and the bytes held in memory and on disk."""
+        with self._lock:
+            return {'hits': self.hits, 'spill_hits': self.spill_hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'bytes': self._bytes, 'spilled_bytes': self._spilled_bytes}
+
+    def clear(self):
+        """Drops every block, from memory and disk."""
+        with self._lock:
+            self._blocks.clear()
+            self._bytes = 0
+            for key in list(self._spilled):
+                self._drop_spilled(key)
+
+    def _add(self, key, data):
+        self._blocks[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            old_key, old_data = self._blocks.popitem(last=False)
+            self._bytes -= len(old_data)
+            self.evictions += 1
+            if self.spill_dir is not None:
+                self._spill(old_key, old_data)
+
+    def _spill_path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, name)
+
+    def _spill(self, key, data):
+        if key in self._spilled or len(data) > self.spill_max_bytes:
+            return
+        try:
+            with open(self._spill_path(key), 'wb') as f:
+                f.write(data)
+        except OSError:
+            return
+        self._spilled[key] = len(data)
+        self._spilled_bytes += len(data)
+        while self._spilled_bytes > self.spill_max_bytes:
+            self._drop_spilled(next(iter(self._spilled)))
+
+    def _unspill(self, key):
+        """Reads a spilled block back, dropping it from disk."""
+        try:
+            with open(self._spill_path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = None
+        self._drop_spilled(key)
+        return data
+
+    def _drop_spilled(self, key):
+        self._spilled_bytes -= self._spilled.pop(key)
+        try:
+            os.remove(self._spill_path(key))
+        except OSError:
+            pass
+
+
+# the cache CachingFileSystems share unless given another one
+default_block_cache = BlockCache()
+
+
+class FooterCache(object):
+    """An LRU cache of the parsed footers of at most max_entries files, as
+    (FileMetaData, offset of the footer in the file) pairs keyed by the path
+    and version of the file, so that opening a file again costs only the
+    version lookup. hits and misses count lookups.
+
+    Cached footers are shared by every reader of the file and mustn't be
+    modified.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._footers = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Returns the footer with the given key, or None if it isn't
+        cached."""
+        with self._lock:
+            footer = self._footers.get(key)
+            if footer is None:
+                self.misses += 1
+                return None
+            self._footers.move_to_end(key)
+            self.hits += 1
+            return footer
+
+    def put(self, key, footer):
+        """Caches the footer with the given key."""
+        with self._lock:
+            self._footers[key] = footer
+            self._footers.move_to_end(key)
+            while len(self._footers) > self.max_entries:
+                self._footers.popitem(last=False)
+
+    def stats(self):
+        """Returns the counters and the number of footers cached."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._footers)}
+
+    def clear(self):
+        """Drops every footer."""
+        with self._lock:
+            self._footers.clear()
+
+
+# the cache readers share unless given another one
+default_footer_cache = FooterCache()
+
+
+class CachingFileSystem(BaseFileSystem):
+    """Wraps a file system, serving read_ranges from a BlockCache.
+
+    Files are cached in block_size aligned blocks, keyed by the path and the
+    version (e.g. mtime and size, or etag) of the file, so a file that
+    changes is read again. The version and size of a file are looked up at
+    most once every version_ttl seconds, and remembered for the max_files
+    most recently used files; a file changing within that time may still be
+    served from the blocks of the old version. Blocks that are missing are
+    fetched with a single read_ranges call to the wrapped file system.
+    """
+
+    def __init__(self, fs, cache=None, block_size=1024 * 1024,
+                 version_ttl=1.0, max_files=1024):
+        self.fs = fs
+        self.cache = cache if cache is not None else default_block_cache
+        self.block_size = block_size
+        self.version_ttl = version_ttl
+        self.max_files = max_files
+        # (time looked up, size, version) by path, least recently used first
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def coalesce_gap(self):
+        return self.fs.coalesce_gap
+
+    def open(self, path, mode='rb'):
+        return self.fs.open(path, mode)
+
+    def is_dir(self, path):
+        return self.fs.is_dir(path)
+
+    def size(self, path):
+        return self.size_and_version(path)[0]
+
+    def version(self, path):
+        return self.size_and_version(path)[1]
+
+    def size_and_version(self, path):
+        """Returns the size and version of the file, looking them up again
+        (with one size_and_version call) if they are older than
+        version_ttl."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None:
+                self._files.move_to_end(path)
+                if now - entry[0] < self.version_ttl:
+                    return entry[1], entry[2]
+        size, version = self.fs.size_and_version(path)
+        with self._lock:
+            self._files[path] = (now, size, version)
+            self._files.move_to_end(path)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return size, version
+
+    def read_ranges(self, path, ranges):
+        size, version = self.size_and_version(path)
+        block_size = self.block_size
+        blocks = {}
+        missing = []
+        for offset, length in ranges:
+            if offset + length > size:
+                raise IOError("found {0} bytes in {1} (expected at least {2})"
+                              .format(size, path, offset + length))
+            first = offset // block_size
+            last = (offset + max(length, 1) - 1) // block_size
+            for index in range(first, last + 1):
+                if index in blocks or index * block_size >= size:
+                    continue
+                data = self.cache.get((path, version, block_size, index))
+                blocks[index] = data
+                if data is None:
+                    missing.append(index)
+        if missing:
+            fetched = self.fs.read_ranges(
+                path, [(i * block_size, min(block_size, size - i * block_size))
+                       for i in missing])
+            for index, data in zip(missing, fetched):
+                data = bytes(data)
+                blocks[index] = data
+                self.cache.put((path, version, block_size, index), data)
+        return [self._assemble(blocks, offset, length)
+                for offset, length in ranges]
+
+    def _assemble(self, blocks, offset, length):
+        """Returns the range from the blocks covering it; a range within a
+        block is a memoryview of it rather than a copy."""
+        block_size = self.block_size
+        index, start = divmod(offset, block_size)
+        if start + length <= block_size:
+            data = blocks.get(index, b"")
+            return memoryview(data)[start:start + length]
+        parts = []
+        while length > 0:
+            data = blocks.get(index, b"")
+            part = memoryview(data)[start:start + length]
+            if not len(part):
+                break
+            parts.append(part)
+            length -= len(part)
+            index += 1
+            start = 0
+        return memoryview(b"".join(parts))
@@ -0,0 +1,143 @@
+"""Registry of the decompressors for the parquet compression codecs.
+
+Codecs whose library can't be imported are not registered, so reading a
+column compressed with them fails with an "Unsupported Codec" error.
+"""
+import gzip
+import logging
+import zlib
+
+from parquet.ttypes import CompressionCodec
+
+logger = logging.getLogger("parquet")
+
+# codec -> function(data, uncompressed_size) returning the decompressed bytes
+decompressors = {}
+# codec -> function(data, out) decompressing into the writable buffer out and
+# returning the number of bytes written
+into_decompressors = {}
+
+
+def register_codec(codec, decompress, decompress_into=None):
+    """Registers the decompress function for the given CompressionCodec. It
+    is called with the compressed bytes (or a memoryview of them) and the
+    expected uncompressed size. Codecs that can write into preallocated
+    memory may also register a decompress_into function."""
+    decompressors[codec] = decompress
+    if decompress_into is not None:
+        into_decompressors[codec] = decompress_into
+
+
+def decompress(data, codec, uncompressed_size):
+    """Decompresses data with the given codec."""
+    return decompressors[codec](data, uncompressed_size)
+
+
+def decompress_into(data, codec, out):
+    """Decompresses data with the given codec into the writable buffer out,
+    which must be exactly the uncompressed size. Falls back to decompress and
+    a copy if the codec can't write into preallocated memory."""
+    if codec in into_decompressors:
+        try:
+            size = into_decompressors[codec](data, out)
+        except Exception:
+            size = -1
+        if size == len(out):
+            return size
+    raw_bytes = decompress(data, codec, len(out))
+    if len(raw_bytes) != len(out):
+        return len(raw_bytes)
+    out[:] = raw_bytes
+    return len(out)
+
+
+def _uncompressed(data, uncompressed_size):
+    return data
+
+
+def _gzip(data, uncompressed_size):
+    # one zlib call with an output buffer of the expected size, rather than
+    # streaming through gzip.GzipFile
+    raw_bytes = zlib.decompress(data, 16 + zlib.MAX_WBITS, uncompressed_size)
+    if len(raw_bytes) < uncompressed_size:
+        # concatenated gzip members; zlib stops after the first one
+        raw_bytes = gzip.decompress(data)
+    return raw_bytes
+
+
+register_codec(CompressionCodec.UNCOMPRESSED, _uncompressed)
+register_codec(CompressionCodec.GZIP, _gzip)
+
+try:
+    import snappy
+    register_codec(CompressionCodec.SNAPPY,
+                   lambda data, uncompressed_size: snappy.decompress(data))
+except ImportError:
+    logger.warn(
+        "Couldn't import snappy. Support for snappy compression disabled.")
+
+try:
+    import zstandard
+
+    def _zstd(data, uncompressed_size):
+        # frames that don't record their content size need the bound
+        return zstandard.ZstdDecompressor().decompress(
+            data, max_output_size=uncompressed_size)
+
+    register_codec(CompressionCodec.ZSTD, _zstd)
+except ImportError:
+    logger.warn(
+        "Couldn't import zstandard. Support for zstd compression disabled.")
+
+try:
+    import brotli
+    register_codec(CompressionCodec.BROTLI,
+                   lambda data, uncompressed_size: brotli.decompress(data))
+except ImportError:
+    logger.warn(
+        "Couldn't import brotli. Support for brotli compression disabled.")
+
+try:
+    import lz4.block
+
+    def _lz4_raw(data, uncompressed_size):
+        return lz4.block.decompress(data, uncompressed_size=uncompressed_size)
+
+    def _lz4_hadoop(data, uncompressed_size):
+        """The deprecated LZ4 codec: blocks framed by the Hadoop codec, each
+        prefixed with big-endian decompressed and compressed sizes. Some
+        writers used raw LZ4 blocks instead, so fall back to those."""
+        view = memoryview(data)
+        chunks = []
+        try:
+            while len(view):
+                size = int.from_bytes(view[:4], 'big')
+                length = int.from_bytes(view[4:8], 'big')
+                if length > len(view) - 8:
+                    raise ValueError("Not Hadoop framed")
+                chunks.append(lz4.block.decompress(view[8:8 + length],
+                                                   uncompressed_size=size))
+                view = view[8 + length:]
+            return b"".join(chunks)
+        except (ValueError, lz4.block.LZ4BlockError):
+            return _lz4_raw(data, uncompressed_size)
+
+    register_codec(CompressionCodec.LZ4_RAW, _lz4_raw)
+    register_codec(CompressionCodec.LZ4, _lz4_hadoop)
+except ImportError:
+    logger.warn("Couldn't import lz4. Support for lz4 compression disabled.")
+
+# cramjam is optional; with it, the common codecs decompress straight into
+# the caller's buffer
+try:
+    import cramjam
+    for codec, decompress_into_fn in [
+            (CompressionCodec.SNAPPY, cramjam.snappy.decompress_raw_into),
+            (CompressionCodec.GZIP, cramjam.gzip.decompress_into),
+            (CompressionCodec.ZSTD, cramjam.zstd.decompress_into),
+            (CompressionCodec.BROTLI, cramjam.brotli.decompress_into),
+            (CompressionCodec.LZ4_RAW, cramjam.lz4.decompress_block_into)]:
+        if codec in decompressors:
+            into_decompressors[codec] = decompress_into_fn
+except ImportError:
+    pass
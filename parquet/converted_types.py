@@ -4,12 +4,22 @@ Deal with parquet logical types (aka converted types), higher-order
 things built from primitive types.
 """
 import datetime
+import decimal
+import json
 import pandas as pd
 import numpy as np
 import struct
 import sys
+
+from parquet.arrays import ByteArray, to_pandas
+
 PY3 = sys.version_info.major > 2
 
+SPARK_ROW_METADATA = 'org.apache.spark.sql.parquet.row.metadata'
+# julian day number of 1970-01-01
+JULIAN_EPOCH_DAY = 2440588
+NANOS_PER_DAY = 86400 * 10 ** 9
+
 # define bytes->int for non 2, 4, 8 byte ints
 if hasattr(int, 'from_bytes'):
     b2int = lambda x: int.from_bytes(x, 'big')
@@ -31,7 +41,8 @@ def map_spark_timestamp(x):
     
     Data should be a column/series of 12-byte values (INT96).
     
-    Use with series.map(map_spark_timestamp)
+    Use with series.map(map_spark_timestamp); int96_to_datetime64 converts a
+    whole column at once.
 
     Note that times are assumed to be UTC.    
     """
@@ -39,39 +50,168 @@ def map_spark_timestamp(x):
     return datetime.datetime.fromtimestamp((days - 2440588) * 86400 + sec / 1000000000)
 
 
-def convert_column(data, schemae):
+def spark_timestamp_columns(key_value_metadata):
+    """Returns the names of the timestamp columns listed in the spark schema
+    stored in the footer key-value metadata, or None if there is none."""
+    for kv in key_value_metadata or []:
+        if kv.key == SPARK_ROW_METADATA:
+            fields = json.loads(kv.value).get('fields', [])
+            return set(f['name'] for f in fields
+                       if f.get('type') == 'timestamp')
+    return None
+
+
+def int96_to_datetime64(data):
+    """Converts an array of INT96 timestamps, as decoded into (nanos, days)
+    structured values, to datetime64[ns] in one vectorized expression.
+    Anything else, e.g. the empty object array of a column with no values
+    left to read, gives an empty array."""
+    data = np.asarray(data)
+    if data.dtype.names is None or not len(data):
+        return np.empty(0, dtype='datetime64[ns]')
+    days = data['days'].astype(np.int64) - JULIAN_EPOCH_DAY
+    return (days * NANOS_PER_DAY + data['nanos']).view('datetime64[ns]')
+
+
+def _decimal_bytes(data):
+    """Returns big-endian two's complement values as an (n, width) uint8
+    matrix, right aligned and sign extended to their largest width, along
+    with a mask of nulls (or None)."""
+    if isinstance(data, pd.Series):
+        data = data.values
+    if isinstance(data, np.ndarray) and data.dtype.kind == 'S':
+        data = np.ascontiguousarray(data)
+        return data.view(np.uint8).reshape(len(data), data.dtype.itemsize), None
+    if not isinstance(data, ByteArray):
+        values = list(data)
+        mask = np.array([v is None for v in values], dtype=bool)
+        data = ByteArray.from_values([b"" if v is None else v for v in values])
+        data.mask = mask if mask.any() else None
+    lengths = data.lengths()
+    width = int(lengths.max()) if len(lengths) else 0
+    start = data.offsets[0]
+    if len(lengths) and (lengths == width).all():
+        matrix = data.data[start:data.offsets[-1]].reshape(len(lengths), width)
+        return matrix, data.mask
+    # scatter every byte to its right aligned column in one go
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    within = np.arange(data.offsets[-1] - start) - np.repeat(
+        data.offsets[:-1] - start, lengths)
+    matrix = np.zeros((len(lengths), width), dtype=np.uint8)
+    matrix[rows, np.repeat(width - lengths, lengths) + within] = \
+        data.data[start:data.offsets[-1]]
+    first = matrix[np.arange(len(lengths)), np.minimum(width - lengths,
+                                                       width - 1)]
+    negative = (lengths > 0) & (first >= 0x80)
+    pad = np.arange(width) < (width - lengths)[:, None]
+    matrix[pad & negative[:, None]] = 0xff
+    return matrix, data.mask
+
+
+def _sign_extend(matrix, width):
+    """Returns the last width bytes of every row of the (n, w) matrix,
+    sign extending rows narrower than width."""
+    n, w = matrix.shape
+    if w >= width:
+        return np.ascontiguousarray(matrix[:, w - width:])
+    out = np.empty((n, width), dtype=np.uint8)
+    if w:
+        out[:, :width - w] = np.where(matrix[:, :1] >= 0x80, 0xff, 0)
+        out[:, width - w:] = matrix
+    else:
+        out[:] = 0
+    return out
+
+
+def decode_decimal(data, scale, precision, unscaled=False):
+    """Decodes big-endian two's complement DECIMAL values, as found in
+    FIXED_LEN_BYTE_ARRAY and BYTE_ARRAY columns, in bulk.
+
+    Values of precision 18 or less become int64 and are divided by
+    10**scale to float64, unless unscaled is true. Wider values become exact
+    python ints, or decimal.Decimal objects unless unscaled is true.
+    """
+    matrix, mask = _decimal_bytes(data)
+    if precision is None:
+        precision = 18 if matrix.shape[1] <= 8 else 38
+    if precision <= 18:
+        values = _sign_extend(matrix, 8).view('>i8').ravel().astype(np.int64)
+        if not unscaled:
+            values = values / 10 ** scale
+        if mask is not None:
+            return pd.Series(to_pandas(values, mask))
+        return pd.Series(values)
+
+    # a precision of up to 38 digits fits in 16 bytes; the high word carries
+    # the sign
+    matrix = _sign_extend(matrix, 16)
+    high = np.ascontiguousarray(matrix[:, :8]).view('>i8').ravel()
+    low = np.ascontiguousarray(matrix[:, 8:]).view('>u8').ravel()
+    values = [(h << 64) | l for h, l in zip(high.tolist(), low.tolist())]
+    if not unscaled:
+        context = decimal.Context(prec=precision + 1)
+        values = [decimal.Decimal(v).scaleb(-scale, context) for v in values]
+    out = np.empty(len(values), dtype=object)
+    out[:] = values
+    if mask is not None:
+        out[mask] = None
+    return pd.Series(out)
+
+
+def convert_column(data, schemae, unscaled_decimals=False):
     """Convert known types from primitive to rich.
-    Designed for pandas series."""
+    Designed for pandas series; BYTE_ARRAY columns may also be passed as a
+    ByteArray and FIXED_LEN_BYTE_ARRAY columns as an 'S<n>' array, which are
+    only turned into python objects here.
+
+    DECIMAL columns are returned as their unscaled integers if
+    unscaled_decimals is true."""
     ctype = types_i[schemae.converted_type]
-    if  ctype == 'DECIMAL':
-        scale = 10**schemae.extra[0]
-        precision = schemae.extra[1]   # not used - defined by byte width
-        if data.dtype == object:
-            out = data.map(b2int) / scale
-        else:
-            out = data / scale
-    elif ctype == 'DATE':
-        # NB: If there are both DATE and TIME_MILLIS, should combine to
-        # datetime as done in map_spark_timestamp
-        out = (data * 86400000000000).astype('datetime64[ns]')
-    elif ctype == 'TIME_MILLIS':
-        out = (data * 1e6).astype('timedelta64[ns]')
-    elif ctype == 'TIMESTAMP_MILLIS':
-        out = pd.to_datetime(data, unit='ms')        
+    if ctype == 'DECIMAL':
+        scale = schemae.scale or 0
+        if isinstance(data, ByteArray) or data.dtype.kind in 'OS':
+            return decode_decimal(data, scale, schemae.precision,
+                                  unscaled_decimals)
+        if unscaled_decimals:
+            return data
+        return data / 10 ** scale
+    if isinstance(data, np.ndarray) and data.dtype.kind == 'S':
+        data = ByteArray.from_fixed(data)
+    if isinstance(data, ByteArray):
+        if ctype == 'UTF8':
+            return pd.Series(data.to_numpy('utf-8'))
+        data = pd.Series(data.to_numpy())
+    if ctype in _TEMPORAL_UNITS:
+        # reinterpret the integers with their unit, then cast to nanoseconds
+        kind, unit = _TEMPORAL_UNITS[ctype]
+        values = np.asarray(data).astype(np.int64)
+        out = pd.Series(values.astype('{0}8[{1}]'.format(kind, unit))
+                        .astype('{0}8[ns]'.format(kind)))
     elif ctype == 'UTF8':
         ## TODO: need decoder for py2
         out = data.map(bytes.decode) if PY3 else out
     elif ctype[0] == "U":
-        # unsigned integers of various widths
-        arr = data.values
-        arr.dtype = np.dtype('u' + arr.dtype.name)
+        # unsigned integers of various widths, stored as signed ints that
+        # may have been widened since
+        bits = ctype.split('_')[1]
+        arr = data.values.astype('int' + bits).view('uint' + bits)
         out = pd.Series(arr)
     else:
-        print("Converted type %i not handled" % ctype)
+        print("Converted type %s not handled" % ctype)
         out = data
     return out
 
 
+# dtype kind and unit of the integers stored for each temporal type
+_TEMPORAL_UNITS = {
+    'DATE': ('M', 'D'),
+    'TIME_MILLIS': ('m', 'ms'),
+    'TIME_MICROS': ('m', 'us'),
+    'TIMESTAMP_MILLIS': ('M', 'ms'),
+    'TIMESTAMP_MICROS': ('M', 'us'),
+}
+
+
 # github.com/Parquet/parquet-format/blob/master/src/thrift/parquet.thrift
 # list possible converted types as follows
 types = dict(
@@ -112,11 +252,21 @@ types = dict(
    #
   TIME_MILLIS = 7,
 
+   # The total number of microseconds since midnight.  The value is stored
+   # as an INT64 physical type.
+   #
+  TIME_MICROS = 8,
+
    # Date and time recorded as milliseconds since the Unix epoch.  Recorded as
    # a physical type of INT64.
    #
   TIMESTAMP_MILLIS = 9,
 
+   # Date and time recorded as microseconds since the Unix epoch.  The value
+   # is stored as an INT64 physical type.
+   #
+  TIMESTAMP_MICROS = 10,
+
    # The number describes the maximum number of meainful data bits in 
    # the stored value. 8, 16 and 32 bit values are stored using the 
    # INT32 physical type.  64 bit values are stored using the INT64
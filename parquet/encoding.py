@@ -1,32 +1,47 @@
-import array
 import math
-import struct
-import io
-import logging
+
+import numpy as np
+
 import parquet._optimized
+from parquet.arrays import ByteArray
 from parquet.ttypes import Type
 
 
+# numpy dtypes of the physical types whose plain encoding is a packed array of
+# little endian values, and can therefore be reinterpreted directly.
+PLAIN_DTYPES = {
+    Type.INT32: np.dtype('<i4'),
+    Type.INT64: np.dtype('<i8'),
+    Type.FLOAT: np.dtype('<f4'),
+    Type.DOUBLE: np.dtype('<f8'),
+    # nanoseconds within the day, then the julian day
+    Type.INT96: np.dtype([('nanos', '<i8'), ('days', '<i4')]),
+}
+
+
 def byte_width(bit_width):
     "Returns the byte width for the given bit_width"
     return int((bit_width + 7) / 8)
 
 
+def _owned(values, fo):
+    """Returns values, an array that may be a view into fo's buffer, copied
+    if that buffer is going to be reused (see parquet.buffers.BufferReader)."""
+    if getattr(fo, 'stable', True):
+        return values
+    return values.copy()
+
+
 def width_from_max_int(value):
     """Converts the value specified to a bit_width."""
     return int(math.ceil(math.log(value + 1, 2)))
 
 
-def _mask_for_bits(i):
-    """Helper function for read_bitpacked to generage a mask to grab i bits."""
-    return (1 << i) - 1
-
 
 class Encoding(object):
     def __init__(self, bit_width):
         self._bit_width = bit_width
         self._byte_width = byte_width(bit_width)
-        self._mask = _mask_for_bits(bit_width)
         self._fast_reader = parquet._optimized.BinaryReader()
         self._DECODE_PLAIN = {
             Type.BOOLEAN: self._fast_reader.read_plain_boolean,
@@ -39,12 +54,87 @@ class Encoding(object):
             Type.FIXED_LEN_BYTE_ARRAY: self._fast_reader.read_plain_byte_array_fixed
         }
 
-    def filter_values(self, dictionary, values, definition_levels):
-        return self._fast_reader.filter_values(dictionary, values, definition_levels)
 
     def read_plain(self, fo, type_, type_length):
         return self._DECODE_PLAIN[type_](fo, type_length)
 
+    def read_plain_array(self, fo, type_, type_length, count):
+        """Reads count plain encoded values of the given type, returning a
+        numpy array.
+
+        Fixed-width numeric types, INT96 (as a structured array), BOOLEAN,
+        FIXED_LEN_BYTE_ARRAY (as an 'S<type_length>' array) and BYTE_ARRAY
+        (returned as a ByteArray) are decoded in bulk; other types fall back
+        to decoding one value at a time.
+        """
+        if type_ in PLAIN_DTYPES:
+            return _owned(self._fast_reader.read_plain_array(
+                fo, PLAIN_DTYPES[type_], count), fo)
+        if type_ == Type.BOOLEAN:
+            return self._fast_reader.read_plain_boolean_array(fo, count)
+        if type_ == Type.BYTE_ARRAY:
+            return self.read_plain_byte_array_page(fo, count)
+        if type_ == Type.FIXED_LEN_BYTE_ARRAY:
+            return self.read_plain_fixed_array(fo, type_length, count)
+        decode = self._DECODE_PLAIN[type_]
+        out = np.empty(count, dtype=object)
+        for i in range(count):
+            out[i] = decode(fo, type_length)
+        return out
+
+    def read_plain_byte_array_page(self, fo, count):
+        """Reads count plain encoded byte arrays from the page buffer fo (a
+        BufferReader) into a ByteArray, without creating a python object per
+        value."""
+        start = fo.tell()
+        data, offsets, consumed = self._fast_reader.read_plain_byte_array_page(
+            fo.getbuffer()[start:], count)
+        fo.seek(start + consumed)
+        return ByteArray(data, offsets)
+
+    def read_plain_fixed_array(self, fo, type_length, count):
+        """Reads count FIXED_LEN_BYTE_ARRAY values from the BufferReader fo
+        as an array of dtype 'S<type_length>' over the page buffer, without
+        copying the bytes or creating a python object per value."""
+        start = fo.tell()
+        values = np.frombuffer(fo.getbuffer(), dtype='S%d' % type_length,
+                               count=count, offset=start)
+        fo.seek(start + type_length * count)
+        return _owned(values, fo)
+
+    def read_delta_binary_packed(self, fo, type_):
+        """Reads DELTA_BINARY_PACKED encoded integers from the BufferReader
+        fo, returning a numpy array with the dtype of the physical type_."""
+        start = fo.tell()
+        values, consumed = self._fast_reader.read_delta_binary_packed(
+            fo.getbuffer()[start:])
+        fo.seek(start + consumed)
+        # 32-bit columns wrap around just like the deltas that encoded them
+        return values.astype(PLAIN_DTYPES[type_], copy=False)
+
+    def read_delta_length_byte_array(self, fo):
+        """Reads DELTA_LENGTH_BYTE_ARRAY encoded values from the BufferReader
+        fo: the delta encoded lengths followed by all values back to back.
+        Returns a ByteArray over the values, which are already contiguous."""
+        lengths = self.read_delta_binary_packed(fo, Type.INT64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = fo.read(offsets[-1])
+        if len(data) != offsets[-1]:
+            raise ValueError("DELTA_LENGTH_BYTE_ARRAY data is shorter than "
+                             "expected")
+        return ByteArray(_owned(np.frombuffer(data, dtype=np.uint8), fo),
+                         offsets)
+
+    def read_delta_byte_array(self, fo):
+        """Reads DELTA_BYTE_ARRAY (incremental) encoded values from the
+        BufferReader fo into a ByteArray."""
+        prefix_lengths = self.read_delta_binary_packed(fo, Type.INT64)
+        suffixes = self.read_delta_length_byte_array(fo)
+        data, offsets = self._fast_reader.read_delta_byte_array(
+            prefix_lengths, suffixes.data, suffixes.offsets)
+        return ByteArray(data, offsets)
+
     def read_rle(self, fo, header):
         """Read a run-length encoded run from the given fo with the given header
         and bit_width.
@@ -57,7 +147,7 @@ class Encoding(object):
     def read_bitpacked(self, fo, header):
         """Reads a bitpacked run of the rle/bitpack hybrid.
 
-        Supports width >8 (crossing bytes).
+        Supports widths from 1 to 32 bits.
         """
         num_groups = header >> 1
         count = num_groups * 8
@@ -67,49 +157,25 @@ class Encoding(object):
 
 
     def read_bitpacked_data(self, data):
-        return self._fast_reader.read_bitpacked_data(data, self._mask, self._bit_width)
+        return self._fast_reader.read_bitpacked_data(data, self._bit_width)
 
 
     def read_bitpacked_deprecated(self, fo, byte_count, count):
-        raw_bytes = array.array('B', fo.read(byte_count)).tolist()
-
-        mask = self._mask
-        index = 0
-        res = []
-        word = 0
-        bits_in_word = 0
-        while len(res) < count and index <= len(raw_bytes):
-            if bits_in_word >= self._bit_width:
-                # how many bits over the value is stored
-                offset = (bits_in_word - self._bit_width)
-                # figure out the value
-                value = (word & (mask << offset)) >> offset
-                res.append(value)
-
-                bits_in_word -= self._bit_width
-            else:
-                word = (word << 8) | raw_bytes[index]
-                index += 1
-                bits_in_word += 8
-        return res
-
-
-    def read_rle_bit_packed_hybrid(self, fo, length=None):
+        """Decodes count values of the deprecated BIT_PACKED encoding, packed
+        from the most significant bit down, from the next byte_count bytes.
+        Returns an int32 numpy array."""
+        return self._fast_reader.read_bitpacked_deprecated(
+            fo.read(byte_count), self._bit_width, count)
+
+    def read_rle_bit_packed_hybrid(self, fo, length=None, count=None):
         """Implementation of a decoder for the rel/bit-packed hybrid encoding.
 
         If length is not specified, then a 32-bit int is read first to grab the
-        length of the encoded data.
+        length of the encoded data. Returns an int32 numpy array with at most
+        count values; by default all values in the encoded data are returned.
         """
-        io_obj = fo
         if length is None:
             length = self._fast_reader.read_plain_int32(fo)
-        start = io_obj.tell()
-        limit = length + start
-        res = []
-        while io_obj.tell() < limit:
-            header = self._fast_reader.read_unsigned_var_int(io_obj)
-            if header & 1 == 0:
-                res += self.read_rle(io_obj, header)
-            else:
-                res += self.read_bitpacked(io_obj, header)
-        return res
+        data = fo.read(length)
+        return self._fast_reader.read_rle_bit_packed_hybrid(
+            data, self._bit_width, count)
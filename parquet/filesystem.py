@@ -1,8 +1,61 @@
 import abc
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import mmap
 import os
+import threading
+from urllib.parse import urlsplit
+
+from parquet.buffers import BufferReader
+
+
+def coalesce_ranges(ranges, max_gap):
+    """Merges (offset, length) byte ranges that overlap or are at most
+    max_gap bytes apart. Returns (offset, length, indices) tuples, where
+    indices are the positions in ranges of the ranges each one covers."""
+    merged = []
+    for i in sorted(range(len(ranges)), key=lambda i: ranges[i][0]):
+        offset, length = ranges[i]
+        if merged and offset - (merged[-1][0] + merged[-1][1]) <= max_gap:
+            start, merged_length, indices = merged[-1]
+            end = max(start + merged_length, offset + length)
+            merged[-1] = (start, end - start, indices + [i])
+        else:
+            merged.append((offset, length, [i]))
+    return merged
+
+
+def read_file_ranges(fileobj, ranges, max_gap):
+    """Reads the (offset, length) ranges of the seekable file-object,
+    returning a memoryview of each. Ranges at most max_gap bytes apart are
+    fetched with a single read."""
+    views = [None] * len(ranges)
+    for start, length, indices in coalesce_ranges(ranges, max_gap):
+        fileobj.seek(start, 0)
+        data = memoryview(fileobj.read(length))
+        if len(data) != length:
+            raise IOError("found {0} bytes at offset {1} (expected {2})"
+                          .format(len(data), start, length))
+        for i in indices:
+            offset, size = ranges[i]
+            views[i] = data[offset - start:offset - start + size]
+    return views
 
 
 class BaseFileSystem(metaclass=abc.ABCMeta):
+    """The file system parquet files are read from.
+
+    Subclasses implement open and is_dir. The reader fetches everything
+    through size and read_ranges, which by default go through open; file
+    systems with a cheaper way to fetch several byte ranges (e.g. object
+    stores) override them.
+    """
+
+    # ranges at most this many bytes apart are fetched together, reading
+    # the gap rather than making another request
+    coalesce_gap = 64 * 1024
 
     @abc.abstractmethod
     def open(self, path, mode='rb'):
@@ -12,10 +65,314 @@ class BaseFileSystem(metaclass=abc.ABCMeta):
     def is_dir(self, path):
         pass
 
+    def size(self, path):
+        """Returns the size of the file in bytes."""
+        with self.open(path, mode='rb') as fileobj:
+            return fileobj.seek(0, 2)
+
+    def version(self, path):
+        """Returns a token that changes whenever the file does, which caches
+        key their entries with. By default that is just the size."""
+        return self.size(path)
+
+    def size_and_version(self, path):
+        """Returns the size and the version of the file. File systems that
+        ask a server for them get both with one request."""
+        return self.size(path), self.version(path)
+
+    def read_ranges(self, path, ranges):
+        """Reads the (offset, length) byte ranges of the file, returning a
+        bytes-like object for each, in the same order."""
+        with self.open(path, mode='rb') as fileobj:
+            return read_file_ranges(fileobj, ranges, self.coalesce_gap)
+
+
+class MappedFile(BufferReader):
+    """A local file mapped read-only into memory.
+
+    read returns memoryview slices of the mapping, so page headers and
+    uncompressed pages are decoded straight from the OS page cache (which is
+    shared by every process reading the file) without being copied.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                self._mmap = None
+            else:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        super(MappedFile, self).__init__(
+            self._mmap if self._mmap is not None else b"")
+        self.name = path
+        self.closed = False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # arrays still reference the mapping; it is unmapped once they
+            # are gone
+            pass
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
 
 class LocalFileSystem(BaseFileSystem):
+    """The local file system. With mmap=True files are opened as
+    MappedFiles."""
+
+    def __init__(self, mmap=False):
+        self.mmap = mmap
+
     def open(self, path, mode='rb'):
+        if self.mmap and mode == 'rb':
+            return MappedFile(path)
         return open(path, mode=mode)
 
     def is_dir(self, path):
         return os.path.isdir(path)
+
+    def size(self, path):
+        return os.path.getsize(path)
+
+    def version(self, path):
+        return self.size_and_version(path)[1]
+
+    def size_and_version(self, path):
+        stat = os.stat(path)
+        return stat.st_size, (stat.st_mtime_ns, stat.st_size)
+
+
+class HTTPFile(object):
+    """A read-only file-like object over a URL, reading with range
+    requests."""
+
+    def __init__(self, fs, url):
+        self._fs = fs
+        self._url = url
+        self._pos = 0
+        self._size = None
+        self.name = url
+
+    def _get_size(self):
+        if self._size is None:
+            self._size = self._fs.size(self._url)
+        return self._size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._get_size() - self._pos
+        if size <= 0:
+            return b""
+        data = self._fs._get_range(self._url, self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._get_size()
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class HTTPFileSystem(BaseFileSystem):
+    """Reads files served over http(s) with range requests; paths are URLs.
+
+    Connections are kept alive and pooled per host. read_ranges merges
+    nearby ranges and fetches the rest concurrently, over at most
+    max_connections connections at a time.
+    """
+
+    def __init__(self, max_connections=8, coalesce_gap=None, timeout=60):
+        if coalesce_gap is not None:
+            self.coalesce_gap = coalesce_gap
+        self._timeout = timeout
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+
+    def open(self, path, mode='rb'):
+        if mode != 'rb':
+            raise ValueError("HTTPFileSystem is read-only")
+        return HTTPFile(self, path)
+
+    def is_dir(self, path):
+        return path.endswith('/')
+
+    def size(self, path):
+        return int(self._head(path).getheader('Content-Length'))
+
+    def version(self, path):
+        return self._version(self._head(path))
+
+    def size_and_version(self, path):
+        response = self._head(path)
+        return int(response.getheader('Content-Length')), \
+            self._version(response)
+
+    def _version(self, response):
+        etag = response.getheader('ETag')
+        if etag is not None:
+            return etag
+        return (response.getheader('Last-Modified'),
+                response.getheader('Content-Length'))
+
+    def _head(self, path):
+        response, _ = self._request(path, 'HEAD')
+        if response.status != 200:
+            raise IOError("HEAD {0} failed with status {1}".format(
+                path, response.status))
+        return response
+
+    def read_ranges(self, path, ranges):
+        merged = coalesce_ranges(ranges, self.coalesce_gap)
+        futures = [self._executor.submit(self._get_range, path, start, length)
+                   for start, length, _ in merged]
+        views = [None] * len(ranges)
+        for (start, length, indices), future in zip(merged, futures):
+            data = memoryview(future.result())
+            for i in indices:
+                offset, size = ranges[i]
+                views[i] = data[offset - start:offset - start + size]
+        return views
+
+    def close(self):
+        """Closes the pooled connections."""
+        self._executor.shutdown()
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _get_range(self, url, start, length):
+        response, data = self._request(
+            url, 'GET',
+            {'Range': 'bytes={0}-{1}'.format(start, start + length - 1)})
+        if response.status == 200:
+            # the server ignored the range and sent the whole file
+            data = data[start:start + length]
+        elif response.status != 206:
+            raise IOError("GET {0} failed with status {1}".format(
+                url, response.status))
+        if len(data) != length:
+            raise IOError("found {0} bytes at offset {1} of {2} (expected "
+                          "{3})".format(len(data), start, url, length))
+        return data
+
+    def _request(self, url, method, headers=None):
+        """Makes a request on a pooled connection, returning the response and
+        its body. A kept-alive connection the server has since closed is
+        retried once on a new one."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        for attempt in range(2):
+            connection, reused = self._acquire(key)
+            try:
+                connection.request(method, target, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                with self._lock:
+                    self._idle[key].append(connection)
+            return response, data
+
+    def _acquire(self, key):
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop(), True
+        scheme, netloc = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(
+                netloc, timeout=self._timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self._timeout), False
+
+
+class AsyncBaseFileSystem(metaclass=abc.ABCMeta):
+    """The asyncio counterpart of BaseFileSystem, used by
+    AsyncParquetReader."""
+
+    @abc.abstractmethod
+    async def is_dir(self, path):
+        pass
+
+    @abc.abstractmethod
+    async def size(self, path):
+        """Returns the size of the file in bytes."""
+
+    async def version(self, path):
+        """Returns a token that changes whenever the file does, like
+        BaseFileSystem.version. By default that is just the size."""
+        return await self.size(path)
+
+    async def size_and_version(self, path):
+        """Returns the size and the version of the file, like
+        BaseFileSystem.size_and_version."""
+        return await self.size(path), await self.version(path)
+
+    @abc.abstractmethod
+    async def read_ranges(self, path, ranges):
+        """Reads the (offset, length) byte ranges of the file, returning a
+        bytes-like object for each, in the same order."""
+
+
+class AsyncFileSystemAdapter(AsyncBaseFileSystem):
+    """Makes a blocking BaseFileSystem usable from asyncio by running its
+    calls on executor (by default the event loop's)."""
+
+    def __init__(self, fs, executor=None):
+        self.fs = fs
+        self._executor = executor
+
+    def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, fn, *args)
+
+    async def is_dir(self, path):
+        return await self._run(self.fs.is_dir, path)
+
+    async def size(self, path):
+        return await self._run(self.fs.size, path)
+
+    async def version(self, path):
+        return await self._run(self.fs.version, path)
+
+    async def size_and_version(self, path):
+        return await self._run(self.fs.size_and_version, path)
+
+    async def read_ranges(self, path, ranges):
+        return await self._run(self.fs.read_ranges, path, ranges)
@@ -1,5 +1,4 @@
 from __future__ import absolute_import, division, print_function
-import gzip
 import json
 import logging
 import struct
@@ -7,22 +6,24 @@ import io
 import sys
 import os.path
 from collections import defaultdict
+
+import numpy as np
+
 from parquet.ttypes import (FileMetaData, CompressionCodec, Encoding,
                     FieldRepetitionType, PageHeader, PageType, Type)
 from thriftpy.protocol.compact import TCompactProtocol
 from thriftpy.transport import TTransportBase
+from parquet import compression
+from parquet.buffers import BufferPool, BufferReader
+from parquet.cache import default_footer_cache
+from parquet.filesystem import LocalFileSystem
 from parquet import encoding
 from parquet import schema
+from parquet.arrays import DictionaryArray, ListArray, fill_nulls, take
 
 
 logger = logging.getLogger("parquet")
 
-try:
-    import snappy
-except ImportError:
-    logger.warn(
-        "Couldn't import snappy. Support for snappy compression disabled.")
-
 class TFileObjectTransport(TTransportBase):
   """Wraps a file-like object to make it work as a Thrift transport."""
 
@@ -36,7 +37,8 @@ class TFileObjectTransport(TTransportBase):
     self.fileobj.close()
 
   def read(self, sz):
-    return self.fileobj.read(sz)
+    # thrift needs bytes; memory mapped files return memoryviews
+    return bytes(self.fileobj.read(sz))
 
   def write(self, buf):
     self.fileobj.write(buf)
@@ -49,9 +51,61 @@ class ParquetFormatException(Exception):
     pass
 
 
+DATA_PAGE_TYPES = (PageType.DATA_PAGE, PageType.DATA_PAGE_V2)
+
+
+def data_page_header(page_header):
+    """Returns the v1 or v2 data page header of the given page header."""
+    if page_header.type == PageType.DATA_PAGE_V2:
+        return page_header.data_page_header_v2
+    return page_header.data_page_header
+
+
+# bytes read from the end of a file in the hope that they hold all of the
+# footer, so it takes a single read unless it is larger
+FOOTER_READ_SIZE = 64 * 1024
+
+
+def footer_tail_range(size):
+    """Returns the (offset, length) range at the end of a file of the given
+    size that is read for its footer."""
+    length = min(size, FOOTER_READ_SIZE)
+    return (size - length, length)
+
+
+def footer_range(filename, size, tail):
+    """Checks the magic bytes in tail, the bytes read from the
+    footer_tail_range of the file, returning the (offset, length) range of
+    its footer. The magic bytes at the start of the file are only checked if
+    tail holds all of it."""
+    tail = memoryview(tail)
+    if len(tail) < 12 or tail[-4:] != b'PAR1' or \
+       (len(tail) == size and tail[:4] != b'PAR1'):
+        raise ParquetFormatException("{0} is not a valid parquet file "
+                                     "(missing magic bytes)".format(filename))
+    footer_size = struct.unpack("<i", tail[-8:-4])[0]
+    if not 0 <= footer_size <= size - 12:
+        raise ParquetFormatException("{0} is not a valid parquet file "
+                                     "(footer length {1} in a file of {2} "
+                                     "bytes)".format(filename, footer_size,
+                                                     size))
+    return (size - 8 - footer_size, footer_size)
+
+
+def footer_in_tail(size, tail, footer):
+    """Returns the footer, given by its (offset, length) range, out of tail
+    if it holds all of it, or None if it has to be read again."""
+    offset, length = footer
+    start = offset - (size - len(tail))
+    if start < 0:
+        return None
+    return memoryview(tail)[start:start + length]
+
+
 class ParquetMain(object):
     def __init__(self):
         self._readers = {}
+        self._buffer_pool = BufferPool()
 
 
     def _get_name(self, type_, value):
@@ -90,13 +144,32 @@ class ParquetMain(object):
         return tup[0]
 
 
-    def _read_footer(self, fo):
+    def _read_footer(self, fo, filename=None):
         """Reads the footer from the given file object, returning a FileMetaData
-        object. This method assumes that the fo references a valid parquet file"""
-        footer_size = self._get_footer_size(fo)
-        fo.seek(-(8 + footer_size), 2)  # seek to beginning of footer
-        tin = TFileObjectTransport(fo)
-        pin = TCompactProtocol(tin)
+        object."""
+        return self._read_footer_and_offset(fo, filename)[0]
+
+
+    def _read_footer_and_offset(self, fo, filename=None):
+        """Reads the footer from the given file object, returning a FileMetaData
+        object and the offset the footer starts at. The end of the file is read
+        at once, and the footer is only read again if it is larger than
+        FOOTER_READ_SIZE."""
+        size = fo.seek(0, 2)
+        offset, length = footer_tail_range(size)
+        fo.seek(offset, 0)
+        tail = fo.read(length)
+        footer = footer_range(filename, size, tail)
+        footer_bytes = footer_in_tail(size, tail, footer)
+        if footer_bytes is None:
+            fo.seek(footer[0], 0)
+            footer_bytes = fo.read(footer[1])
+        return self.parse_footer(footer_bytes), footer[0]
+
+
+    def parse_footer(self, footer_bytes):
+        """Parses the serialized FileMetaData of a footer."""
+        pin = TCompactProtocol(TFileObjectTransport(BufferReader(footer_bytes)))
         fmd = FileMetaData()
         fmd.read(pin)
         return fmd
@@ -112,18 +185,22 @@ class ParquetMain(object):
 
 
     def read_footer(self, filename, fileobj=None):
-        """Reads and returns the FileMetaData object for the given file."""
-        if fileobj is None:
-            do_close = True
-            fileobj = open(filename, 'rb')
-        else:
-            do_close = False
-        try:
-            self._validate_parquet_file(fileobj, filename)
-            return self._read_footer(fileobj)
-        finally:
-            if do_close:
-                fileobj.close()
+        """Reads and returns the FileMetaData object for the given file.
+
+        Unless fileobj is given, the footer is looked up in (and added to)
+        default_footer_cache, keyed by the path and the LocalFileSystem
+        version of the file, like ParquetReader does. The cached FileMetaData
+        is shared, so it mustn't be modified.
+        """
+        if fileobj is not None:
+            return self._read_footer(fileobj, filename)
+        key = (filename, LocalFileSystem().version(filename))
+        cached = default_footer_cache.get(key)
+        if cached is None:
+            with open(filename, 'rb') as fileobj:
+                cached = self._read_footer_and_offset(fileobj, filename)
+            default_footer_cache.put(key, cached)
+        return cached[0]
 
     def _validate_parquet_file(self, fo, filename=None):
         if not self._check_header_magic_bytes(fo) or \
@@ -212,11 +289,11 @@ class ParquetMain(object):
                             ph = self._read_page_header(fo)
                             # seek past current page.
                             fo.seek(ph.compressed_page_size, 1)
-                            daph = ph.data_page_header
+                            daph = data_page_header(ph)
                             type_ = self._get_name(PageType, ph.type)
                             raw_bytes = ph.uncompressed_page_size
                             num_values = None
-                            if ph.type == PageType.DATA_PAGE:
+                            if ph.type in DATA_PAGE_TYPES:
                                 num_values = daph.num_values
                                 values_read += num_values
                             if ph.type == PageType.DICTIONARY_PAGE:
@@ -226,7 +303,10 @@ class ParquetMain(object):
                             encoding_type = None
                             def_level_encoding = None
                             rep_level_encoding = None
-                            if daph:
+                            if daph and ph.type == PageType.DATA_PAGE_V2:
+                                encoding_type = self._get_name(Encoding, daph.encoding)
+                                def_level_encoding = rep_level_encoding = 'RLE'
+                            elif daph:
                                 encoding_type = self._get_name(Encoding, daph.encoding)
                                 def_level_encoding = self._get_name(
                                     Encoding, daph.definition_level_encoding)
@@ -246,144 +326,290 @@ class ParquetMain(object):
                                         rep_level_encoding=rep_level_encoding))
 
 
-    def _read_page(self, fo, page_header, column_metadata):
+    def _read_bytes(self, fo, size):
+        """Reads size bytes from the given file-object, returning them and
+        whether they are stable. Pages are parsed from a BufferReader over the
+        column chunk (or a MappedFile), so this is a view of it rather than a
+        copy; only decompression draws buffers from the pool."""
+        data = fo.read(size)
+        if len(data) != size:
+            raise ParquetFormatException(
+                "found {0} bytes in page (expected {1})".format(len(data),
+                                                               size))
+        return data, getattr(fo, 'stable', True)
+
+    def release_buffers(self, buffers):
+        """Returns the pooled buffers pages were decompressed into to the
+        pool."""
+        for view in buffers:
+            self._buffer_pool.release(view)
+        del buffers[:]
+
+    def _read_page(self, fo, page_header, column_metadata, buffers):
         """Internal function to read the data page from the given file-object
-        and convert it to raw, uncompressed bytes (if necessary)."""
-        bytes_from_file = fo.read(page_header.compressed_page_size)
-        codec = column_metadata.codec
-        if codec is not None and codec != CompressionCodec.UNCOMPRESSED:
-            if column_metadata.codec == CompressionCodec.SNAPPY:
-                raw_bytes = snappy.decompress(bytes_from_file)
-            elif column_metadata.codec == CompressionCodec.GZIP:
-                io_obj = io.BytesIO(bytes_from_file)
-                with gzip.GzipFile(fileobj=io_obj, mode='rb') as f:
-                    raw_bytes = f.read()
-            else:
-                raise ParquetFormatException(
-                    "Unsupported Codec: {0}".format(codec))
-        else:
+        and convert it to raw, uncompressed bytes (if necessary). Returns a
+        BufferReader over them; pooled buffers used are appended to
+        buffers."""
+        bytes_from_file, stable = self._read_bytes(
+            fo, page_header.compressed_page_size)
+        return self._decompress(bytes_from_file, column_metadata.codec,
+                                page_header.uncompressed_page_size, buffers,
+                                stable)
+
+    def _decompress(self, bytes_from_file, codec, uncompressed_size,
+                    buffers, stable=True):
+        """Returns a BufferReader over the given bytes decompressed with the
+        given codec. Codecs that support it decompress into a pooled buffer,
+        which is appended to buffers. stable tells whether bytes_from_file
+        outlives the page."""
+        if codec is None or codec == CompressionCodec.UNCOMPRESSED:
             raw_bytes = bytes_from_file
-        assert len(raw_bytes) == page_header.uncompressed_page_size, \
+        elif codec not in compression.decompressors:
+            raise ParquetFormatException(
+                "Unsupported Codec: {0}".format(
+                    self._get_name(CompressionCodec, codec)))
+        elif codec in compression.into_decompressors:
+            raw_bytes = self._buffer_pool.get(uncompressed_size)
+            buffers.append(raw_bytes)
+            stable = False
+            size = compression.decompress_into(bytes_from_file, codec,
+                                               raw_bytes)
+            assert size == uncompressed_size, \
+                "found {0} raw bytes (expected {1})".format(
+                    size, uncompressed_size)
+        else:
+            raw_bytes = compression.decompress(bytes_from_file, codec,
+                                               uncompressed_size)
+            stable = True
+        assert len(raw_bytes) == uncompressed_size, \
             "found {0} raw bytes (expected {1})".format(
-                len(raw_bytes),
-                page_header.uncompressed_page_size)
-        return raw_bytes
+                len(raw_bytes), uncompressed_size)
+        return BufferReader(raw_bytes, stable=stable)
 
+    def _read_page_v2(self, fo, page_header, column_metadata, buffers):
+        """Reads a DATA_PAGE_V2 page from the given file-object, returning a
+        file-like object over its levels and one over its uncompressed values.
 
-    def _read_data(self, fo, fo_encoding, value_count, bit_width):
+        The repetition and definition levels are never compressed, so only the
+        values section goes through the codec, and only if is_compressed is
+        set. An uncompressed page is read without being copied.
+        """
+        daph = page_header.data_page_header_v2
+        bytes_from_file, stable = self._read_bytes(
+            fo, page_header.compressed_page_size)
+        levels_length = daph.repetition_levels_byte_length + \
+            daph.definition_levels_byte_length
+        levels_io_obj = BufferReader(bytes_from_file, stable=stable)
+        if daph.is_compressed is False:
+            values_io_obj = BufferReader(bytes_from_file, stable=stable)
+            values_io_obj.seek(levels_length)
+            return levels_io_obj, values_io_obj
+
+        return levels_io_obj, self._decompress(
+            memoryview(bytes_from_file)[levels_length:], column_metadata.codec,
+            page_header.uncompressed_page_size - levels_length, buffers,
+            stable)
+
+    def _read_data(self, fo, fo_encoding, value_count, bit_width, length=None):
         """Internal method to read data from the file-object using the given
         encoding. The data could be definition levels, repetition levels, or
-        actual values.
+        actual values. length is the size of rle encoded data if it isn't
+        prefixed with it.
         """
-        vals = []
         reader = self._get_reader(bit_width)
         if fo_encoding == Encoding.RLE:
-            seen = 0
-            while seen < value_count:
-                values = reader.read_rle_bit_packed_hybrid(fo)
-                if values is None:
-                    break  # EOF was reached.
-                vals += values
-                seen += len(values)
+            return reader.read_rle_bit_packed_hybrid(fo, length, value_count)
         elif fo_encoding == Encoding.BIT_PACKED:
-            raise NotImplementedError("Bit packing not yet supported")
-
-        return vals
-
-    def _read_definitions(self, io_obj, daph, schema_helper, column_metadata):
+            byte_count = (value_count * bit_width + 7) // 8
+            return reader.read_bitpacked_deprecated(fo, byte_count, value_count)
+        return np.zeros(0, dtype=np.intc)
+
+    def _read_definitions(self, io_obj, num_values, level_encoding,
+                          schema_helper, column_metadata, length=None):
+        max_definition_level = schema_helper.max_definition_level(
+            column_metadata.path_in_schema)
         # definition levels are skipped if data is required.
-        if not schema_helper.is_required(column_metadata.path_in_schema[-1]):
-            max_definition_level = schema_helper.max_definition_level(
-                column_metadata.path_in_schema)
-            bit_width = encoding.width_from_max_int(max_definition_level)
-            if bit_width == 0:
-                definition_levels = [0] * daph.num_values
-            else:
-                definition_levels = self._read_data(io_obj,
-                                                    daph.definition_level_encoding,
-                                                    daph.num_values,
-                                                    bit_width)
-            return definition_levels
-        return None
-
-    def _read_repetitions(self, io_obj, daph, schema_helper, column_metadata):
-        if len(column_metadata.path_in_schema) > 1:
-            max_repetition_level = schema_helper.max_repetition_level(
-                column_metadata.path_in_schema)
-            bit_width = encoding.width_from_max_int(max_repetition_level)
-            repetition_levels = self._read_data(io_obj,
-                                                daph.repetition_level_encoding,
-                                                daph.num_values, bit_width)
-            return repetition_levels
-        return None
-
-    def _read_plain(self, io_obj, daph, column_metadata, reader):
-        vals = []
-        width = column_metadata.num_values
-        for i in range(daph.num_values):
-            dat = reader.read_plain(io_obj, column_metadata.type, width)
-            vals.append(dat)
-        return vals
-
-    def _read_plain_dict(self, io_obj, daph, definition_levels, dictionary):
+        if max_definition_level == 0:
+            return None
+        bit_width = encoding.width_from_max_int(max_definition_level)
+        return self._read_data(io_obj, level_encoding, num_values, bit_width,
+                               length)
+
+    def _read_repetitions(self, io_obj, num_values, level_encoding,
+                          schema_helper, column_metadata, length=None):
+        max_repetition_level = schema_helper.max_repetition_level(
+            column_metadata.path_in_schema)
+        # repetition levels are skipped if there is no repeated field.
+        if max_repetition_level == 0:
+            return None
+        bit_width = encoding.width_from_max_int(max_repetition_level)
+        return self._read_data(io_obj, level_encoding, num_values, bit_width,
+                               length)
+
+    def _read_plain(self, io_obj, type_, width, count, reader):
+        return reader.read_plain_array(io_obj, type_, width, count)
+
+    def _read_plain_dict(self, io_obj, count):
+        """Reads count dictionary indices, returning them as an int32 array."""
         # bit_width is stored as single byte.
         bit_width = struct.unpack("<B", io_obj.read(1))[0]
-        dict_values_bytes = io_obj.read()
-        dict_values_io_obj = io.BytesIO(dict_values_bytes)
+        start = io_obj.tell()
+        length = io_obj.seek(0, io.SEEK_END) - start
+        io_obj.seek(start)
         reader = self._get_reader(bit_width)
-        values = reader.read_rle_bit_packed_hybrid(
-            dict_values_io_obj, len(dict_values_bytes))
-
-        if definition_levels is not None:
-            vals = reader.filter_values(dictionary, values, definition_levels)
-        else:
-            vals = [dictionary[v] for v in values]
-
-        if len(vals)  > daph.num_values:
-            vals = vals[0: daph.num_values]
-        return vals
+        return reader.read_rle_bit_packed_hybrid(io_obj, length, count)
 
     def read_data_page(self, fo, schema_helper, page_header, column_metadata,
-                       dictionary):
+                       dictionary, dictionary_indices=False, width=None):
         """Reads the datapage from the given file-like object based upon the
         metadata in the schema_helper, page_header, column_metadata, and
-        (optional) dictionary. Returns a list of values.
-        """
-        daph = page_header.data_page_header
-        raw_bytes = self._read_page(fo, page_header, column_metadata)
-        io_obj = io.BytesIO(raw_bytes)
+        (optional) dictionary. Returns an array of values.
 
-        definition_levels = self._read_definitions(io_obj, daph,
-                                                   schema_helper,
-                                                   column_metadata)
-        self._read_repetitions(io_obj, daph, schema_helper,
-                               column_metadata)
+        If dictionary_indices is true, dictionary encoded pages are returned as
+        a DictionaryArray instead of being looked up in the dictionary.
+        """
+        buffers = []
+        try:
+            page = self.read_page_data(fo, page_header, column_metadata,
+                                       buffers)
+            return self.decode_data_page(page, schema_helper, page_header,
+                                         column_metadata, dictionary,
+                                         dictionary_indices, width)
+        finally:
+            self.release_buffers(buffers)
+
+    def read_page_data(self, fo, page_header, column_metadata, buffers):
+        """Reads the page from the given file-like object and decompresses
+        it, returning a file-like object over a dictionary or v1 data page or
+        a (levels, values) pair of them for a DATA_PAGE_V2. Pooled buffers the
+        page is held in are appended to buffers; release them with
+        release_buffers once it is decoded."""
+        if page_header.type == PageType.DATA_PAGE_V2:
+            return self._read_page_v2(fo, page_header, column_metadata,
+                                      buffers)
+        return self._read_page(fo, page_header, column_metadata, buffers)
+
+    def decode_data_page(self, page, schema_helper, page_header,
+                         column_metadata, dictionary,
+                         dictionary_indices=False, width=None):
+        """Decodes a data page returned by read_page_data, like
+        read_data_page. width is the type_length of FIXED_LEN_BYTE_ARRAY
+        columns."""
+        if page_header.type == PageType.DATA_PAGE_V2:
+            daph = page_header.data_page_header_v2
+            levels_io_obj, io_obj = page
+            repetition_levels = definition_levels = None
+            if daph.repetition_levels_byte_length:
+                repetition_levels = self._read_repetitions(
+                    levels_io_obj, daph.num_values, Encoding.RLE,
+                    schema_helper, column_metadata,
+                    daph.repetition_levels_byte_length)
+            if daph.definition_levels_byte_length:
+                definition_levels = self._read_definitions(
+                    levels_io_obj, daph.num_values, Encoding.RLE,
+                    schema_helper, column_metadata,
+                    daph.definition_levels_byte_length)
+        else:
+            daph = page_header.data_page_header
+            io_obj = page
+
+            repetition_levels = self._read_repetitions(
+                io_obj, daph.num_values, daph.repetition_level_encoding,
+                schema_helper, column_metadata)
+            definition_levels = self._read_definitions(
+                io_obj, daph.num_values, daph.definition_level_encoding,
+                schema_helper, column_metadata)
+
+        valid = None
+        count = daph.num_values
+        if definition_levels is not None:
+            max_definition_level = schema_helper.max_definition_level(
+                column_metadata.path_in_schema)
+            valid = definition_levels[:daph.num_values] == max_definition_level
+            count = int(valid.sum())
+            if count == daph.num_values:
+                valid = None
+        if repetition_levels is not None:
+            # nulls are placed while the lists are assembled
+            dictionary_indices = False
 
         reader = self._get_reader(1)
         if daph.encoding == Encoding.PLAIN:
-            vals = self._read_plain(io_obj, daph, column_metadata, reader)
-        elif daph.encoding == Encoding.PLAIN_DICTIONARY:
-            vals = self._read_plain_dict(io_obj, daph, definition_levels, dictionary)
+            vals = self._read_plain(io_obj, column_metadata.type, width, count,
+                                    reader)
+        elif daph.encoding == Encoding.RLE and \
+                column_metadata.type == Type.BOOLEAN:
+            # as written to DATA_PAGE_V2 pages by e.g. pyarrow: a 4 byte
+            # length, then the values in the hybrid encoding of bit width 1
+            vals = reader.read_rle_bit_packed_hybrid(io_obj, None, count)
+            if len(vals) != count:
+                raise ParquetFormatException(
+                    "Expected {0} rle encoded booleans, found {1}".format(
+                        count, len(vals)))
+            vals = vals.astype(bool)
+        elif daph.encoding == Encoding.DELTA_BINARY_PACKED:
+            vals = reader.read_delta_binary_packed(io_obj, column_metadata.type)
+            if len(vals) != count:
+                raise ParquetFormatException(
+                    "Expected {0} delta encoded values, found {1}".format(
+                        count, len(vals)))
+        elif daph.encoding in (Encoding.DELTA_LENGTH_BYTE_ARRAY,
+                               Encoding.DELTA_BYTE_ARRAY):
+            if daph.encoding == Encoding.DELTA_BYTE_ARRAY:
+                vals = reader.read_delta_byte_array(io_obj)
+            else:
+                vals = reader.read_delta_length_byte_array(io_obj)
+            if len(vals) != count:
+                raise ParquetFormatException(
+                    "Expected {0} delta encoded values, found {1}".format(
+                        count, len(vals)))
+        elif daph.encoding in (Encoding.PLAIN_DICTIONARY,
+                               Encoding.RLE_DICTIONARY):
+            indices = self._read_plain_dict(io_obj, count)
 
-            if len(vals) != daph.num_values:
+            if len(indices) != count:
                 raise ParquetFormatException("Error reading enough data from dictionary")
+            if dictionary_indices:
+                if valid is not None:
+                    all_indices = np.full(daph.num_values, -1, dtype=np.int32)
+                    all_indices[valid] = indices
+                    indices = all_indices
+                return DictionaryArray(indices, dictionary)
+            vals = take(dictionary, indices)
         else:
             raise ParquetFormatException(
                 "Unsupported encoding: %s",
                 self._get_name(Encoding, daph.encoding))
+        if repetition_levels is not None:
+            return ListArray.from_levels(
+                repetition_levels[:daph.num_values],
+                definition_levels[:daph.num_values],
+                schema_helper.list_levels(column_metadata.path_in_schema),
+                vals, max_definition_level)
+        if valid is not None:
+            vals = fill_nulls(vals, valid)
         return vals
 
 
     def read_dictionary_page(self, fo, page_header, column_metadata, width=None):
-        raw_bytes = self._read_page(fo, page_header, column_metadata)
-        io_obj = io.BytesIO(raw_bytes)
-        dict_items = []
+        """Reads the dictionary page from the given file-like object, returning
+        the dictionary values as a numpy array."""
+        buffers = []
+        try:
+            page = self.read_page_data(fo, page_header, column_metadata,
+                                       buffers)
+            return self.decode_dictionary_page(page, page_header,
+                                               column_metadata, width)
+        finally:
+            self.release_buffers(buffers)
+
+    def decode_dictionary_page(self, page, page_header, column_metadata,
+                               width=None):
+        """Decodes a dictionary page returned by read_page_data."""
         reader = self._get_reader(1)
-        l = len(raw_bytes)
-        while io_obj.tell() < l:
-            dat = reader.read_plain(io_obj, column_metadata.type, width)
-            dict_items.append(dat)
-        return dict_items
+        return self._read_plain(page, column_metadata.type, width,
+                                page_header.dictionary_page_header.num_values,
+                                reader)
 
 
     def _dump(self, fo, options, out=sys.stdout):
@@ -400,7 +626,6 @@ class ParquetMain(object):
         total_count = 0
         for rg in footer.row_groups:
             res = defaultdict(list)
-            row_group_rows = rg.num_rows
             for idx, cg in enumerate(rg.columns):
                 dict_items = []
                 cmd = cg.meta_data
@@ -411,22 +636,23 @@ class ParquetMain(object):
                 offset = self._get_offset(cmd)
                 fo.seek(offset, 0)
                 values_seen = 0
-                while values_seen < row_group_rows:
+                while values_seen < cmd.num_values:
                     ph = self._read_page_header(fo)
-                    if ph.type == PageType.DATA_PAGE:
+                    if ph.type in DATA_PAGE_TYPES:
                         values = self.read_data_page(fo, schema_helper, ph, cmd,
                                                      dict_items)
-                        res[".".join(cmd.path_in_schema)] += values
-                        values_seen += ph.data_page_header.num_values
+                        res[".".join(cmd.path_in_schema)] += values.tolist()
+                        values_seen += data_page_header(ph).num_values
                     elif ph.type == PageType.DICTIONARY_PAGE:
                         logger.debug(ph)
-                        assert dict_items == []
+                        assert len(dict_items) == 0
                         dict_items = self.read_dictionary_page(fo, ph, cmd)
                     else:
                         logger.warn("Skipping unknown page type={0}".format(
                             _get_name(PageType, ph.type)))
-            keys = options.col if options.col else [s.name for s in
-                                                    footer.schema if s.name in res]
+            keys = options.col if options.col else [
+                ".".join(path) for path in schema_helper.leaves
+                if ".".join(path) in res]
             if options.format == 'custom':
                 custom_datatype = out(res, keys)
                 return custom_datatype
@@ -1,36 +1,131 @@
+#include <limits.h>
 #include <stdlib.h>
+#include <string.h>
 
-int read_bitpacked_internal(void *data, int data_len, int mask, int* res, int total, int bit_width)
+/* Unpacks one group of 8 little-endian bit-packed values of width w. The group
+ * occupies exactly w bytes. w is a compile time constant at every call site, so
+ * the loops below are fully unrolled into straight-line shifts and masks. */
+static inline void unpack8(const unsigned char *in, int *out, const int w)
 {
-    unsigned char * raw_bytes =  (unsigned char*)data;
-    int current_byte = 0;
-    unsigned int b = (unsigned int) raw_bytes[current_byte];
-    int bits_wnd_l = 8;
-    int bits_wnd_r = 0;
-    int idx = 0;
-    while (total >= bit_width) {
-        if (bits_wnd_r >= 8) {
-            bits_wnd_r -= 8;
-            bits_wnd_l -= 8;
-            b >>= 8;
-        }
-        else if (bits_wnd_l - bits_wnd_r >= bit_width) {
-            res[idx] = (b >> bits_wnd_r) & mask;
-            idx += 1;
-            total -= bit_width;
-            bits_wnd_r += bit_width;
-        }
-        else if (current_byte + 1 < data_len) {
-            current_byte += 1;
-            b |= (raw_bytes[current_byte] << bits_wnd_l);
-            bits_wnd_l += 8;
+    const unsigned long long mask = (1ULL << w) - 1;
+    int i, b;
+    for (i = 0; i < 8; i++) {
+        const int bit = i * w;
+        const int start = bit >> 3;
+        const int shift = bit & 7;
+        const int nbytes = (shift + w + 7) >> 3;
+        unsigned long long v = 0;
+        for (b = 0; b < nbytes; b++) {
+            v |= ((unsigned long long)in[start + b]) << (8 * b);
         }
+        out[i] = (int)((v >> shift) & mask);
     }
-    return idx;
+}
+
+typedef void (*unpack8_fn)(const unsigned char *in, int *out);
+
+#define DEFINE_UNPACK8(W) \
+static void unpack8_##W(const unsigned char *in, int *out) { unpack8(in, out, W); }
+
+DEFINE_UNPACK8(1)  DEFINE_UNPACK8(2)  DEFINE_UNPACK8(3)  DEFINE_UNPACK8(4)
+DEFINE_UNPACK8(5)  DEFINE_UNPACK8(6)  DEFINE_UNPACK8(7)  DEFINE_UNPACK8(8)
+DEFINE_UNPACK8(9)  DEFINE_UNPACK8(10) DEFINE_UNPACK8(11) DEFINE_UNPACK8(12)
+DEFINE_UNPACK8(13) DEFINE_UNPACK8(14) DEFINE_UNPACK8(15) DEFINE_UNPACK8(16)
+DEFINE_UNPACK8(17) DEFINE_UNPACK8(18) DEFINE_UNPACK8(19) DEFINE_UNPACK8(20)
+DEFINE_UNPACK8(21) DEFINE_UNPACK8(22) DEFINE_UNPACK8(23) DEFINE_UNPACK8(24)
+DEFINE_UNPACK8(25) DEFINE_UNPACK8(26) DEFINE_UNPACK8(27) DEFINE_UNPACK8(28)
+DEFINE_UNPACK8(29) DEFINE_UNPACK8(30) DEFINE_UNPACK8(31) DEFINE_UNPACK8(32)
+
+static const unpack8_fn UNPACK8[33] = {
+    NULL,        unpack8_1,  unpack8_2,  unpack8_3,  unpack8_4,  unpack8_5,
+    unpack8_6,   unpack8_7,  unpack8_8,  unpack8_9,  unpack8_10, unpack8_11,
+    unpack8_12,  unpack8_13, unpack8_14, unpack8_15, unpack8_16, unpack8_17,
+    unpack8_18,  unpack8_19, unpack8_20, unpack8_21, unpack8_22, unpack8_23,
+    unpack8_24,  unpack8_25, unpack8_26, unpack8_27, unpack8_28, unpack8_29,
+    unpack8_30,  unpack8_31, unpack8_32
+};
+
+/* Unpacks count bit-packed values of bit_width (0-32) bits from the data_len
+ * bytes at data. Whole groups of 8 are handed to the width-specialized kernel;
+ * a trailing partial group is unpacked from a zero padded copy so that no byte
+ * past data_len is read. Returns the number of values unpacked. */
+int unpack_bits(const unsigned char *data, int data_len, int bit_width, int *res, int count)
+{
+    unpack8_fn kernel;
+    unsigned char tmp[32];
+    int tmp_out[8];
+    int available;
+    int idx = 0;
+    if (bit_width < 0 || bit_width > 32) {
+        return -1;
+    }
+    if (bit_width == 0) {
+        memset(res, 0, count * sizeof(int));
+        return count;
+    }
+    available = (int)(((long long)data_len * 8) / bit_width);
+    if (count > available) {
+        count = available;
+    }
+    kernel = UNPACK8[bit_width];
+    while (count - idx >= 8) {
+        kernel(data, res + idx);
+        data += bit_width;
+        data_len -= bit_width;
+        idx += 8;
+    }
+    if (idx < count) {
+        memset(tmp, 0, sizeof(tmp));
+        memcpy(tmp, data, data_len < bit_width ? data_len : bit_width);
+        kernel(tmp, tmp_out);
+        memcpy(res + idx, tmp_out, (count - idx) * sizeof(int));
+    }
+    return count;
+}
 
+int read_bitpacked_internal(const unsigned char *data, int data_len, int* res, int bit_width)
+{
+    if (bit_width <= 0) {
+        return 0;
+    }
+    return unpack_bits(data, data_len, bit_width, res,
+                       (int)(((long long)data_len * 8) / bit_width));
+}
+
+/* Unpacks count values of the deprecated BIT_PACKED encoding, which packs
+   values from the most significant bit of each byte down, into res. Returns
+   the number of values unpacked, fewer than count if data runs out. */
+int unpack_bits_msb(const unsigned char *data, int data_len, int bit_width, int *res, int count)
+{
+    unsigned long long buffer = 0;
+    unsigned int mask;
+    int available;
+    int bits = 0;
+    int idx = 0;
+    if (bit_width < 0 || bit_width > 32) {
+        return -1;
+    }
+    if (bit_width == 0) {
+        memset(res, 0, count * sizeof(int));
+        return count;
+    }
+    available = (int)(((long long)data_len * 8) / bit_width);
+    if (count > available) {
+        count = available;
+    }
+    mask = bit_width == 32 ? 0xFFFFFFFFu : (1u << bit_width) - 1;
+    while (idx < count) {
+        while (bits < bit_width) {
+            buffer = (buffer << 8) | *data++;
+            bits += 8;
+        }
+        bits -= bit_width;
+        res[idx++] = (int)((buffer >> bits) & mask);
+    }
+    return count;
 }
 
- long read_litle_endian_int(unsigned char *data)
+ long read_litle_endian_int(const unsigned char *data)
  {
     long x = 0;
     int i = 4;
@@ -40,4 +135,308 @@ int read_bitpacked_internal(void *data, int data_len, int mask, int* res, int to
     x |= -(x & (1L << ((8 * 4) - 1)));
     return x;
 
- }
\ No newline at end of file
+ }
+
+static int read_unsigned_var_int_internal(const unsigned char *data, int data_len, int *pos, unsigned int *out)
+{
+    unsigned int result = 0;
+    int shift = 0;
+    while (*pos < data_len && shift < 35) {
+        unsigned char byte = data[*pos];
+        *pos += 1;
+        result |= ((unsigned int)(byte & 0x7F)) << shift;
+        if ((byte & 0x80) == 0) {
+            *out = result;
+            return 0;
+        }
+        shift += 7;
+    }
+    return -1;
+}
+
+int count_rle_bit_packed_hybrid(const unsigned char *data, int data_len, int bit_width)
+{
+    int byte_width = (bit_width + 7) / 8;
+    int pos = 0;
+    long long total = 0;
+    unsigned int header;
+    while (pos < data_len) {
+        if (read_unsigned_var_int_internal(data, data_len, &pos, &header) != 0) {
+            return -1;
+        }
+        if (header & 1) {
+            /* counted in 64 bits, as a crafted header overflows an int */
+            long long nbytes = (long long)(header >> 1) * bit_width;
+            if (nbytes > data_len - pos) {
+                if (nbytes - (data_len - pos) >= bit_width) {
+                    return -1;
+                }
+                nbytes = data_len - pos;
+            }
+            total += bit_width ? nbytes * 8 / bit_width : 0;
+            pos += (int)nbytes;
+        } else {
+            if (byte_width > data_len - pos) {
+                return -1;
+            }
+            total += (long long)(header >> 1);
+            pos += byte_width;
+        }
+        if (total > INT_MAX) {
+            return -1;
+        }
+    }
+    return (int)total;
+}
+
+int read_rle_bit_packed_hybrid_internal(const unsigned char *data, int data_len, int bit_width, int *res, int total)
+{
+    int byte_width = (bit_width + 7) / 8;
+    int pos = 0;
+    int idx = 0;
+    unsigned int header;
+    while (idx < total && pos < data_len) {
+        if (read_unsigned_var_int_internal(data, data_len, &pos, &header) != 0) {
+            return -1;
+        }
+        if (header & 1) {
+            /* bit-packed run of (header >> 1) groups of 8 values, counted in
+             * 64 bits as a crafted header overflows an int */
+            long long nbytes = (long long)(header >> 1) * bit_width;
+            long long count;
+            if (nbytes > data_len - pos) {
+                /* writers may leave out the unused bytes of the last group */
+                if (nbytes - (data_len - pos) >= bit_width) {
+                    return -1;
+                }
+                nbytes = data_len - pos;
+            }
+            count = bit_width ? nbytes * 8 / bit_width : (long long)(header >> 1) * 8;
+            if (count > total - idx) {
+                count = total - idx;
+            }
+            if (unpack_bits(data + pos, data_len - pos, bit_width, res + idx, (int)count) < 0) {
+                return -1;
+            }
+            idx += (int)count;
+            pos += (int)nbytes;
+        } else {
+            /* rle run of a single value repeated (header >> 1) times */
+            long long count = (long long)(header >> 1);
+            unsigned int value = 0;
+            int i;
+            if (byte_width > data_len - pos) {
+                return -1;
+            }
+            for (i = byte_width - 1; i >= 0; i--) {
+                value = (value << 8) | data[pos + i];
+            }
+            pos += byte_width;
+            if (count > total - idx) {
+                count = total - idx;
+            }
+            for (i = 0; i < count; i++) {
+                res[idx + i] = (int)value;
+            }
+            idx += (int)count;
+        }
+    }
+    return idx;
+}
+
+long long scan_byte_array_lengths(const unsigned char *data, long long data_len, int count, long long *offsets)
+{
+    long long pos = 0;
+    int i;
+    offsets[0] = 0;
+    for (i = 0; i < count; i++) {
+        unsigned int length;
+        if (pos + 4 > data_len) {
+            return -1;
+        }
+        length = (unsigned int)data[pos] | ((unsigned int)data[pos + 1] << 8) |
+                 ((unsigned int)data[pos + 2] << 16) | ((unsigned int)data[pos + 3] << 24);
+        pos += 4 + (long long)length;
+        if (pos > data_len) {
+            return -1;
+        }
+        offsets[i + 1] = offsets[i] + length;
+    }
+    return pos;
+}
+
+void gather_byte_array(const unsigned char *data, int count, const long long *offsets, unsigned char *out)
+{
+    int i;
+    for (i = 0; i < count; i++) {
+        memcpy(out + offsets[i], data + 4 * ((long long)i + 1) + offsets[i],
+               offsets[i + 1] - offsets[i]);
+    }
+}
+
+/* Copies count values, value i being the bytes of data from starts[i] up to
+ * the length given by offsets, to out at offsets[i]. */
+void take_byte_array(const unsigned char *data, long long count, const long long *starts, const long long *offsets, unsigned char *out)
+{
+    long long i;
+    for (i = 0; i < count; i++) {
+        memcpy(out + offsets[i], data + starts[i], offsets[i + 1] - offsets[i]);
+    }
+}
+
+static int read_unsigned_var_int64(const unsigned char *data, long long data_len, long long *pos, unsigned long long *out)
+{
+    unsigned long long result = 0;
+    int shift = 0;
+    while (*pos < data_len && shift < 70) {
+        unsigned char byte = data[*pos];
+        *pos += 1;
+        result |= ((unsigned long long)(byte & 0x7F)) << shift;
+        if ((byte & 0x80) == 0) {
+            *out = result;
+            return 0;
+        }
+        shift += 7;
+    }
+    return -1;
+}
+
+static long long zigzag_decode(unsigned long long value)
+{
+    return (long long)(value >> 1) ^ -(long long)(value & 1);
+}
+
+/* Unpacks count values wider than 32 bits; such widths only occur for deltas
+ * of INT64 columns so they do not get specialized kernels. */
+static void unpack_bits64(const unsigned char *data, int bit_width, unsigned long long *res, int count)
+{
+    const unsigned long long mask = bit_width == 64 ? ~0ULL : (1ULL << bit_width) - 1;
+    int idx, b;
+    for (idx = 0; idx < count; idx++) {
+        const long long bit = (long long)idx * bit_width;
+        const unsigned char *in = data + (bit >> 3);
+        const int shift = (int)(bit & 7);
+        const int nbytes = (shift + bit_width + 7) >> 3;
+        unsigned long long v = 0;
+        for (b = 0; b < nbytes && b < 8; b++) {
+            v |= ((unsigned long long)in[b]) << (8 * b);
+        }
+        v >>= shift;
+        if (nbytes > 8) {
+            v |= ((unsigned long long)in[8]) << (64 - shift);
+        }
+        res[idx] = v & mask;
+    }
+}
+
+int read_delta_binary_packed_count(const unsigned char *data, long long data_len)
+{
+    long long pos = 0;
+    unsigned long long block_size, miniblocks, total;
+    if (read_unsigned_var_int64(data, data_len, &pos, &block_size) != 0 ||
+        read_unsigned_var_int64(data, data_len, &pos, &miniblocks) != 0 ||
+        read_unsigned_var_int64(data, data_len, &pos, &total) != 0 ||
+        total > 0x7FFFFFFF) {
+        return -1;
+    }
+    return (int)total;
+}
+
+/* Decodes up to count DELTA_BINARY_PACKED values into out. out[0] receives the
+ * first value and out[i] the delta between values i - 1 and i, so a prefix sum
+ * over out yields the values. Returns the number of bytes consumed, or -1 if
+ * the data is corrupt. */
+long long read_delta_binary_packed_internal(const unsigned char *data, long long data_len, long long *out, int count)
+{
+    long long pos = 0;
+    unsigned long long block_size, miniblocks, total, raw;
+    int values_per_miniblock;
+    int n, idx, m, k;
+    int *tmp;
+    if (read_unsigned_var_int64(data, data_len, &pos, &block_size) != 0 ||
+        read_unsigned_var_int64(data, data_len, &pos, &miniblocks) != 0 ||
+        read_unsigned_var_int64(data, data_len, &pos, &total) != 0 ||
+        read_unsigned_var_int64(data, data_len, &pos, &raw) != 0) {
+        return -1;
+    }
+    if (miniblocks == 0 || block_size == 0 || block_size % miniblocks != 0 ||
+        (block_size / miniblocks) % 8 != 0 || block_size > 0x7FFFFFFF) {
+        return -1;
+    }
+    values_per_miniblock = (int)(block_size / miniblocks);
+    n = total < (unsigned long long)count ? (int)total : count;
+    if (n == 0) {
+        return pos;
+    }
+    out[0] = zigzag_decode(raw);
+    idx = 1;
+    tmp = (int *)malloc(values_per_miniblock * sizeof(int));
+    if (tmp == NULL) {
+        return -1;
+    }
+    while (idx < n) {
+        unsigned long long min_delta;
+        const unsigned char *widths;
+        if (read_unsigned_var_int64(data, data_len, &pos, &raw) != 0 ||
+            pos + (long long)miniblocks > data_len) {
+            free(tmp);
+            return -1;
+        }
+        min_delta = (unsigned long long)zigzag_decode(raw);
+        widths = data + pos;
+        pos += miniblocks;
+        for (m = 0; m < (int)miniblocks && idx < n; m++) {
+            const int bit_width = widths[m];
+            const int take = n - idx < values_per_miniblock ? n - idx : values_per_miniblock;
+            const long long size = (long long)values_per_miniblock * bit_width / 8;
+            const long long available = data_len - pos;
+            if (bit_width > 64 || ((long long)take * bit_width + 7) / 8 > available) {
+                free(tmp);
+                return -1;
+            }
+            if (bit_width <= 32) {
+                unpack_bits(data + pos, (int)(size < available ? size : available),
+                            bit_width, tmp, take);
+                for (k = 0; k < take; k++) {
+                    out[idx + k] = (long long)(min_delta + (unsigned int)tmp[k]);
+                }
+            } else {
+                unsigned long long *deltas = (unsigned long long *)(out + idx);
+                unpack_bits64(data + pos, bit_width, deltas, take);
+                for (k = 0; k < take; k++) {
+                    deltas[k] += min_delta;
+                }
+            }
+            pos += size < available ? size : available;
+            idx += take;
+        }
+    }
+    free(tmp);
+    return pos;
+}
+
+/* Rebuilds DELTA_BYTE_ARRAY values: value i is the first prefix_lengths[i]
+ * bytes of value i - 1 followed by suffix i. The values are written back to
+ * back into out, which must hold the sum of all prefix and suffix lengths, and
+ * their count + 1 offsets into offsets. Returns -1 if a prefix is longer than
+ * the value it refers to. */
+int read_delta_byte_array_internal(const long long *prefix_lengths, const unsigned char *suffix_data, const long long *suffix_offsets, int count, unsigned char *out, long long *offsets)
+{
+    long long pos = 0;
+    long long previous = 0;
+    int i;
+    offsets[0] = 0;
+    for (i = 0; i < count; i++) {
+        const long long prefix = prefix_lengths[i];
+        const long long suffix = suffix_offsets[i + 1] - suffix_offsets[i];
+        if (prefix < 0 || prefix > pos - previous) {
+            return -1;
+        }
+        memmove(out + pos, out + previous, prefix);
+        memcpy(out + pos + prefix, suffix_data + suffix_offsets[i], suffix);
+        previous = pos;
+        pos += prefix + suffix;
+        offsets[i + 1] = pos;
+    }
+    return 0;
+}
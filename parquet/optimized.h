@@ -1,2 +1,12 @@
-int read_bitpacked_internal(void *data, int data_len, int mask, int* res, int total, int bit_width);
-long read_litle_endian_int(unsigned char *data);
\ No newline at end of file
+int unpack_bits(const unsigned char *data, int data_len, int bit_width, int *res, int count);
+int read_bitpacked_internal(const unsigned char *data, int data_len, int* res, int bit_width);
+int unpack_bits_msb(const unsigned char *data, int data_len, int bit_width, int *res, int count);
+long read_litle_endian_int(const unsigned char *data);
+int count_rle_bit_packed_hybrid(const unsigned char *data, int data_len, int bit_width);
+int read_rle_bit_packed_hybrid_internal(const unsigned char *data, int data_len, int bit_width, int *res, int total);
+long long scan_byte_array_lengths(const unsigned char *data, long long data_len, int count, long long *offsets);
+void gather_byte_array(const unsigned char *data, int count, const long long *offsets, unsigned char *out);
+void take_byte_array(const unsigned char *data, long long count, const long long *starts, const long long *offsets, unsigned char *out);
+int read_delta_binary_packed_count(const unsigned char *data, long long data_len);
+long long read_delta_binary_packed_internal(const unsigned char *data, long long data_len, long long *out, int count);
+int read_delta_byte_array_internal(const long long *prefix_lengths, const unsigned char *suffix_data, const long long *suffix_offsets, int count, unsigned char *out, long long *offsets);
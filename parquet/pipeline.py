@@ -0,0 +1,241 @@
+"""A read pipeline overlapping I/O, decompression and decoding."""
+from collections import defaultdict
+import queue
+import threading
+
+import pandas as pd
+
+from parquet.buffers import BufferReader
+from parquet.main import DATA_PAGE_TYPES, data_page_header
+from parquet.reader import _concat
+from parquet.ttypes import PageType
+
+
+# how often (in seconds) blocked stages check whether the pipeline is closed
+_POLL_INTERVAL = 0.05
+
+
+class _Failure(object):
+    """An exception raised in a stage, passed on to the consumer."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class ReadPipeline(object):
+    """Reads the row groups of a ParquetReader through bounded queues, so
+    that fetching, decompressing and decoding overlap::
+
+        fetch thread -> fetched -> decompress workers -> decompressed
+            -> decode workers -> decoded -> consumer
+
+    Column chunks move through the stages one at a time. Each queue holds at
+    most queue_size of them and a stage blocks while the next one is full, so
+    memory stays bounded however far ahead the fetch thread could run: the
+    next row group is read while this one is decoded. queue_depths shows how
+    full each queue is, and has been at most, to tune queue_size and the
+    number of workers against.
+
+    Iterating yields a DataFrame per row group, starting from the first one
+    regardless of what the reader has read. The reader mustn't be used while
+    the pipeline runs.
+    """
+
+    STAGES = ('fetched', 'decompressed', 'decoded')
+
+    def __init__(self, reader, columns=None, categorical=False,
+                 unscaled_decimals=False, queue_size=4, decompress_workers=2,
+                 decode_workers=2):
+        if columns:
+            for c in columns:
+                if c not in reader._cols:
+                    raise ValueError("Unknown column {}".format(c))
+        self._reader = reader
+        self._main = reader._main
+        self._columns = columns or reader._cols
+        if categorical is True:
+            categorical = self._columns
+        categorical = set(categorical or [])
+        self._unscaled_decimals = unscaled_decimals
+        self._decompress_workers = decompress_workers
+        self._decode_workers = decode_workers
+        self._queues = dict((stage, queue.Queue(queue_size))
+                            for stage in self.STAGES)
+        self._max_depths = dict.fromkeys(self.STAGES, 0)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._threads = []
+
+        # the (column chunk, name, width, dictionary_indices) of each row group
+        self._row_groups = []
+        for rg in reader._rg:
+            chunks = []
+            for col in rg.columns:
+                name, width = reader._get_column_info(col)
+                if name not in self._columns:
+                    continue
+                nested = reader._schema_helper.max_repetition_level(
+                    col.meta_data.path_in_schema) > 0
+                chunks.append((col, name, width,
+                               name in categorical and not nested))
+            self._row_groups.append(chunks)
+
+    def queue_depths(self):
+        """Returns the number of column chunks waiting in each queue and the
+        most there have been, as {stage: (depth, max_depth)}."""
+        with self._lock:
+            return dict((stage, (self._queues[stage].qsize(),
+                                 self._max_depths[stage]))
+                        for stage in self.STAGES)
+
+    def __iter__(self):
+        if self._threads:
+            raise RuntimeError("The pipeline has already been started")
+        self._start()
+        decoded = {}
+        try:
+            for index, chunks in enumerate(self._row_groups):
+                while any((index, name) not in decoded
+                          for _, name, _, _ in chunks):
+                    item = self._get('decoded')
+                    if isinstance(item, _Failure):
+                        raise item.exception
+                    item_index, name, values = item
+                    decoded[item_index, name] = values
+                res = dict((name, [decoded.pop((index, name))])
+                           for _, name, _, _ in chunks)
+                yield self._reader._make_dataframe(res, self._columns,
+                                                   self._unscaled_decimals)
+        finally:
+            self.close()
+
+    def read(self):
+        """Reads every row group into one DataFrame."""
+        frames = list(self)
+        if not frames:
+            return self._reader._make_dataframe({}, self._columns,
+                                                self._unscaled_decimals)
+        return pd.concat(frames, ignore_index=True)
+
+    def close(self):
+        """Stops the stages, discarding whatever they hold."""
+        self._closed.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _start(self):
+        targets = [self._fetch] + \
+            [self._decompress] * self._decompress_workers + \
+            [self._decode] * self._decode_workers
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _put(self, stage, item):
+        """Puts item on the stage's queue, blocking while it is full. Returns
+        false if the pipeline was closed instead."""
+        while not self._closed.is_set():
+            try:
+                self._queues[stage].put(item, timeout=_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            with self._lock:
+                self._max_depths[stage] = max(self._max_depths[stage],
+                                              self._queues[stage].qsize())
+            return True
+        return False
+
+    def _get(self, stage):
+        """Takes the next item off the stage's queue, or returns None if the
+        pipeline was closed."""
+        while not self._closed.is_set():
+            try:
+                return self._queues[stage].get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _fetch(self):
+        """Reads the column chunks of each row group in turn, with one
+        read_ranges call per file."""
+        try:
+            for index, chunks in enumerate(self._row_groups):
+                by_file = defaultdict(list)
+                for chunk in chunks:
+                    by_file[chunk[0].file_path].append(chunk)
+                for file_name, file_chunks in by_file.items():
+                    ranges = [self._reader._chunk_range(col)
+                              for col, _, _, _ in file_chunks]
+                    views = self._reader._read_file_ranges(file_name, ranges)
+                    for chunk, view in zip(file_chunks, views):
+                        if not self._put('fetched', (index, chunk, view)):
+                            return
+        except Exception as e:
+            self._put('fetched', _Failure(e))
+
+    def _decompress(self):
+        """Splits column chunks into pages and decompresses them."""
+        while True:
+            item = self._get('fetched')
+            if item is None:
+                return
+            if not isinstance(item, _Failure):
+                try:
+                    item = self._decompress_chunk(*item)
+                except Exception as e:
+                    item = _Failure(e)
+            if not self._put('decompressed', item):
+                return
+
+    def _decompress_chunk(self, index, chunk, view):
+        col = chunk[0]
+        cmd = col.meta_data
+        fo = BufferReader(view)
+        pages = []
+        buffers = []
+        values_seen = 0
+        # num_values counts repetition levels, so it is larger than the
+        # number of rows for columns with repeated fields
+        while values_seen < cmd.num_values:
+            ph = self._main._read_page_header(fo)
+            if ph.type in DATA_PAGE_TYPES:
+                values_seen += data_page_header(ph).num_values
+            elif ph.type != PageType.DICTIONARY_PAGE:
+                fo.seek(ph.compressed_page_size, 1)
+                continue
+            pages.append((ph, self._main.read_page_data(fo, ph, cmd,
+                                                        buffers)))
+        return index, chunk, pages, buffers
+
+    def _decode(self):
+        """Decodes the pages of column chunks into arrays."""
+        while True:
+            item = self._get('decompressed')
+            if item is None:
+                return
+            if not isinstance(item, _Failure):
+                try:
+                    item = self._decode_chunk(*item)
+                except Exception as e:
+                    item = _Failure(e)
+            if not self._put('decoded', item):
+                return
+
+    def _decode_chunk(self, index, chunk, pages, buffers):
+        col, name, width, dictionary_indices = chunk
+        cmd = col.meta_data
+        dictionary = []
+        column = []
+        try:
+            for ph, page in pages:
+                if ph.type == PageType.DICTIONARY_PAGE:
+                    dictionary = self._main.decode_dictionary_page(
+                        page, ph, cmd, width)
+                else:
+                    column.append(self._main.decode_data_page(
+                        page, self._reader._schema_helper, ph, cmd,
+                        dictionary, dictionary_indices, width))
+        finally:
+            self._main.release_buffers(buffers)
+        return index, name, _concat(column)
@@ -1,13 +1,51 @@
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 import os.path
 
+import numpy as np
 import pandas as pd
 
-from .main import ParquetMain
-from .ttypes import PageType
-from .converted_types import convert_column
+from .arrays import ByteArray, DictionaryArray, ListArray, concat, to_pandas
+from .buffers import BufferReader
+from .cache import default_footer_cache
+from .main import (DATA_PAGE_TYPES, ParquetMain, data_page_header,
+                   footer_in_tail, footer_range, footer_tail_range)
+from .ttypes import PageType, Type
+from .converted_types import (convert_column, int96_to_datetime64,
+                              spark_timestamp_columns)
 from .schema import SchemaHelper
-from .filesystem import LocalFileSystem
+from .filesystem import LocalFileSystem, read_file_ranges
+
+
+# Narrow physical types are widened when the DataFrame is built, matching the
+# dtypes pandas infers for python ints and floats.
+_FRAME_DTYPES = {
+    np.dtype('int32'): np.dtype('int64'),
+    np.dtype('float32'): np.dtype('float64'),
+}
+
+
+# the most bytes a dictionary page header takes. parquet-mr used to leave it
+# out of the total_compressed_size of column chunks (PARQUET-816), so chunks
+# are read up to this much further, but not past the next chunk or the footer
+MAX_DICTIONARY_HEADER_SIZE = 100
+
+
+def _concat(chunks):
+    """Joins the arrays decoded from consecutive pages into one array."""
+    # a row group without values gives an empty object array, which can't be
+    # joined with the ByteArrays or DictionaryArrays of the others
+    chunks = [c for c in chunks if len(c)] or chunks[:1]
+    if len(chunks) == 0:
+        return np.empty(0, dtype=object)
+    if all(isinstance(c, DictionaryArray) for c in chunks):
+        if len(chunks) == 1:
+            return chunks[0]
+        return DictionaryArray.concat(chunks)
+    # pages that fell back from dictionary encoding are mixed with the rest
+    chunks = [c.decode() if isinstance(c, DictionaryArray) else c
+              for c in chunks]
+    return concat(chunks)
 
 
 class CurrentLocation(object):
@@ -21,26 +59,57 @@ class CurrentLocation(object):
 
 
 class ParquetReader(object):
-    def __init__(self, binary_stream, fs=None):
-        self._fs = fs or LocalFileSystem()
+    """Reads a parquet file (or a directory with a _metadata file) into pandas
+    DataFrames.
+
+    If max_workers is given, pages are decompressed and decoded on a pool of
+    that many threads, for all the selected column chunks of a row group at
+    once. The file itself is still read on the calling thread.
+
+    If mmap is true (and no fs is given), local files are memory mapped and
+    pages decoded from the mapping without being copied.
+
+    footer is the FileMetaData of the main file, if it has already been read,
+    and footer_offset where it starts in the file, if known. Otherwise it is
+    looked up in footer_cache (a FooterCache, shared by default; None disables
+    it) by the path and version of the main file, unless a stream is read.
+    """
+
+    def __init__(self, binary_stream, fs=None, max_workers=None, mmap=False,
+                 footer=None, footer_cache=default_footer_cache,
+                 footer_offset=None):
+        self._fs = fs or LocalFileSystem(mmap=mmap)
+        self._footer_cache = footer_cache
+        self._executor = None
+        if max_workers is not None:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
 
         self._main_file = None
         self._directory = None
         self._main_filename = None
-        self._files = {}
         self._main = ParquetMain()
         self._open_main(binary_stream)
-        self._footer = self._main.read_footer(self._main_filename, self._main_file)
+        if footer is None:
+            footer, footer_offset = self._read_footer()
+        self._footer = footer
         self._schema_helper = SchemaHelper(self._footer.schema)
         self._rg = self._footer.row_groups
         self._cg = self._rg[0].columns
-        self._schema = [s for s in self._footer.schema if s.num_children is None]
+        self._schema = dict(
+            (".".join(path), self._schema_helper.schema_element(path))
+            for path in self._schema_helper.leaves)
         self._cols = []
         for c in self._cg:
             self._cols.append(".".join([x for x in c.meta_data.path_in_schema]))
         self._rows = self._footer.num_rows
+        self._spark_timestamps = spark_timestamp_columns(
+            self._footer.key_value_metadata)
         self._row_group_index = 0
         self._column_group_locations = defaultdict(CurrentLocation)
+        # column chunks by (row group index, name); those of row groups that
+        # have been read are dropped
+        self._chunks = {}
+        self._chunk_limits = self._find_chunk_limits(footer_offset)
         self._rows_read = 0
 
     def __del__(self):
@@ -53,114 +122,252 @@ class ParquetReader(object):
                 self._main_filename = os.path.join(binary_stream_or_name, "_metadata")
             else:
                 self._main_filename = binary_stream_or_name
-            self._main_file = self._open_file(self._main_filename)
         else:
             self._main_file = binary_stream_or_name
 
     def _is_directory(self, file_name):
         return self._fs.is_dir(file_name)
 
-    def _open_file(self, file_name):
-        fileobj = self._fs.open(file_name, mode='rb')
-        self._files[file_name] = fileobj
-        return fileobj
-
-    def _close_file(self, fileobj):
-        fileobj.close()
-
-    def _get_file(self, file_name):
+    def _read_file_ranges(self, file_name, ranges):
+        """Reads (offset, length) ranges of the given data file of the
+        directory, or of the main file if file_name is None. Files are read
+        through the file system's read_ranges; a stream passed in instead of
+        a path is read directly."""
+        if file_name is None and self._main_filename is None:
+            return read_file_ranges(self._main_file, ranges,
+                                    self._fs.coalesce_gap)
+        return self._fs.read_ranges(self._file_path(file_name), ranges)
+
+    def _file_path(self, file_name):
+        """Returns the path of the given data file of the directory, or of the
+        main file if file_name is None."""
+        if file_name is None:
+            return self._main_filename
         if self._directory is not None:
-            file_name = os.path.join(self._directory, file_name)
-        if file_name in self._files:
-            return self._files[file_name]
-        return self._open_file(file_name)
+            return os.path.join(self._directory, file_name)
+        return file_name
+
+    def _read_footer(self):
+        """Reads the footer of the main file, or takes it from the footer
+        cache, returning it and the offset it starts at. The end of the file
+        is read in one request, which holds the whole footer unless it is
+        larger than FOOTER_READ_SIZE."""
+        if self._main_filename is None:
+            return self._main._read_footer_and_offset(self._main_file)
+        cache = self._footer_cache
+        size, version = self._fs.size_and_version(self._main_filename)
+        key = (self._main_filename, version)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        tail, = self._read_file_ranges(None, [footer_tail_range(size)])
+        footer_bytes_range = footer_range(self._main_filename, size, tail)
+        footer_bytes = footer_in_tail(size, tail, footer_bytes_range)
+        if footer_bytes is None:
+            footer_bytes, = self._read_file_ranges(None, [footer_bytes_range])
+        cached = (self._main.parse_footer(footer_bytes), footer_bytes_range[0])
+        if cache is not None:
+            cache.put(key, cached)
+        return cached
+
+    def _find_chunk_limits(self, footer_offset):
+        """Returns the offset each column chunk can be read up to at most, by
+        (file name, offset of the chunk): that of the next chunk in the same
+        file, or of the footer after the last chunk of the main file."""
+        offsets = defaultdict(set)
+        for rg in self._rg:
+            for col in rg.columns:
+                offsets[col.file_path].add(
+                    self._main._get_offset(col.meta_data))
+        limits = {}
+        for file_name, starts in offsets.items():
+            starts = sorted(starts)
+            ends = starts[1:] + [footer_offset if file_name is None else None]
+            for start, end in zip(starts, ends):
+                limits[file_name, start] = end
+        return limits
 
     def close(self):
-        for fileobj in self._files.values():
-            self._close_file(fileobj)
-        self._files = {}
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown()
+            self._executor = None
 
     def _get_column_info(self, col):
         name = ".".join(x for x in col.meta_data.path_in_schema)
-        ind = [s for s in self._schema if s.name == name]
-        width = ind[0].type_length
+        width = self._schema[name].type_length
         return (name, width)
 
-    def _read_rows_in_group(self, col, name, width, rg, remaining_rows,
-                            natural):
-        file_name = col.file_path
-
-        if file_name is not None:
-            fileobj = self._get_file(file_name)
-        else:
-            fileobj = self._main_file
-        offset = self._main._get_offset(col.meta_data)
-        fileobj.seek(offset, 0)
+    def _column_pages(self, col, width, location_in_group, natural,
+                      dictionary_indices):
+        """Walks the pages of the column chunk, yielding the index of each
+        page that isn't skipped together with a function returning its
+        decoded values (None for dictionary pages).
+
+        The pages are parsed from the chunk read by _read_column_chunks.
+        Without a thread pool each page is decoded when its function is
+        called, so the functions must be called in order. With one, the pages
+        are decoded on the pool.
+        """
+        fileobj = BufferReader(self._chunks[
+            self._row_group_index, ".".join(col.meta_data.path_in_schema)])
         cmd = col.meta_data
-        cmd.width = width
-        location_in_group = self._column_group_locations[name]
-        total_rows_in_group = rg.num_rows
         values_seen = 0
         page_index = 0
-        column = []
         dict_items = []
 
-        while values_seen < total_rows_in_group:
+        # num_values counts repetition levels, so it is larger than the
+        # number of rows for columns with repeated fields
+        while values_seen < cmd.num_values:
             ph = self._main._read_page_header(fileobj)
             if page_index < location_in_group._page_index and not natural:
                 # skip
-                if ph.type == PageType.DATA_PAGE:
+                if ph.type in DATA_PAGE_TYPES:
                     fileobj.seek(ph.compressed_page_size, 1)
-                    daph = ph.data_page_header
-                    values_seen += daph.num_values
+                    values_seen += data_page_header(ph).num_values
                 elif ph.type == PageType.DICTIONARY_PAGE:
-                    dict_items = self._main.read_dictionary_page(fileobj, ph, cmd)
-            else:
-                # start reading rows.
-                if ph.type == PageType.DATA_PAGE:
-                    values = self._main.read_data_page(fileobj,
-                                                       self._schema_helper, ph,
-                                                       cmd, dict_items)
-
-                    # Need to check which values to keep
-                    if location_in_group._row_index != 0:
-                        values = values[location_in_group._row_index:]
-
-                    done = False
-                    if remaining_rows is not None:
-                        if len(values) + len(column) >= remaining_rows:
-                            done = True
-                            needed = remaining_rows - len(column)
-                            if needed != len(values):
-                                values = values[:needed]
-                                location_in_group._page_index = page_index
-                                location_in_group._row_index += needed
-                            else:
-                                location_in_group._page_index += 1
-                                location_in_group._row_index = 0
-                    column += values
-                    if done:
-                        return column
-
-                    values_seen += ph.data_page_header.num_values
-                elif ph.type == PageType.DICTIONARY_PAGE:
-                    dict_items = self._main.read_dictionary_page(fileobj, ph, cmd)
-            if page_index < location_in_group._page_index:
-                page_index += 1
-            else:
+                    dict_items = self._read_dictionary_page(fileobj, ph, cmd,
+                                                            width)
+            elif ph.type in DATA_PAGE_TYPES:
+                yield page_index, self._read_data_page(
+                    fileobj, ph, cmd, dict_items, dictionary_indices, width)
+                values_seen += data_page_header(ph).num_values
+            elif ph.type == PageType.DICTIONARY_PAGE:
+                dict_items = self._read_dictionary_page(fileobj, ph, cmd,
+                                                        width)
+                yield page_index, None
+            page_index += 1
+
+    def _read_column_chunks(self, cols):
+        """Reads the given column chunks of the current row group into
+        self._chunks, unless they already are. The chunks of each file are
+        fetched with one read_ranges call, which merges nearby ones."""
+        for key in list(self._chunks):
+            if key[0] < self._row_group_index:
+                del self._chunks[key]
+        for file_name, chunks in self._chunk_ranges(
+                self._row_group_index, cols).items():
+            views = self._read_file_ranges(file_name,
+                                           [r for _, r in chunks])
+            for (key, _), view in zip(chunks, views):
+                self._chunks[key] = view
+
+    def _chunk_ranges(self, row_group_index, cols):
+        """Returns the (key, (offset, length)) ranges of the given column
+        chunks of a row group that haven't been read yet, by file name."""
+        by_file = defaultdict(list)
+        for col in cols:
+            key = (row_group_index, ".".join(col.meta_data.path_in_schema))
+            if key not in self._chunks:
+                by_file[col.file_path].append((key, self._chunk_range(col)))
+        return by_file
+
+    def _chunk_range(self, col):
+        """Returns the (offset, length) range of a column chunk: its
+        total_compressed_size and up to MAX_DICTIONARY_HEADER_SIZE bytes more,
+        if that doesn't run into the next chunk or the footer."""
+        cmd = col.meta_data
+        offset = self._main._get_offset(cmd)
+        length = cmd.total_compressed_size
+        limit = self._chunk_limits.get((col.file_path, offset))
+        if limit is not None:
+            length = max(length, min(length + MAX_DICTIONARY_HEADER_SIZE,
+                                     limit - offset))
+        return offset, length
+
+    def _read_dictionary_page(self, fileobj, ph, cmd, width):
+        """Returns the dictionary, or a future of it with a thread pool."""
+        if self._executor is None:
+            return self._main.read_dictionary_page(fileobj, ph, cmd, width)
+        # a slice of the column chunk, not a copy
+        raw_bytes = fileobj.read(ph.compressed_page_size)
+        return self._executor.submit(self._main.read_dictionary_page,
+                                     BufferReader(raw_bytes), ph, cmd, width)
+
+    def _read_data_page(self, fileobj, ph, cmd, dict_items,
+                        dictionary_indices, width):
+        """Returns a function returning the decoded values of the page."""
+        if self._executor is None:
+            return lambda: self._main.read_data_page(
+                fileobj, self._schema_helper, ph, cmd, dict_items,
+                dictionary_indices, width)
+        raw_bytes = fileobj.read(ph.compressed_page_size)
+        return self._executor.submit(
+            self._decode_data_page, BufferReader(raw_bytes), ph, cmd,
+            dict_items, dictionary_indices, width).result
+
+    def _decode_data_page(self, fo, ph, cmd, dict_items, dictionary_indices,
+                          width):
+        if isinstance(dict_items, Future):
+            # submitted before this page, so it is already being decoded
+            dict_items = dict_items.result()
+        return self._main.read_data_page(fo, self._schema_helper, ph, cmd,
+                                         dict_items, dictionary_indices,
+                                         width)
+
+    def _read_rows_in_group(self, col, name, width, rg, remaining_rows,
+                            natural, dictionary_indices=False, pages=None):
+        """Reads the column chunk, up to remaining_rows rows. pages are the
+        already read pages of the chunk (see _column_pages), if any."""
+        location_in_group = self._column_group_locations[name]
+        if pages is None:
+            pages = self._column_pages(col, width, location_in_group, natural,
+                                       dictionary_indices)
+        column = []
+        column_length = 0
+
+        for page_index, read_values in pages:
+            if read_values is not None:
+                values = read_values()
+
+                # Need to check which values to keep
+                if location_in_group._row_index != 0:
+                    values = values[location_in_group._row_index:]
+
+                done = False
+                if remaining_rows is not None:
+                    if len(values) + column_length >= remaining_rows:
+                        done = True
+                        needed = remaining_rows - column_length
+                        if needed != len(values):
+                            values = values[:needed]
+                            location_in_group._page_index = page_index
+                            location_in_group._row_index += needed
+                        else:
+                            location_in_group._page_index += 1
+                            location_in_group._row_index = 0
+                column.append(values)
+                column_length += len(values)
+                if done:
+                    return _concat(column)
+
+            if page_index >= location_in_group._page_index:
                 location_in_group._page_index = page_index
                 location_in_group._row_index = 0
-                page_index += 1
 
-        return column
+        return _concat(column)
 
-    def read(self, columns=None, rows=None, natural=False):
+    def read(self, columns=None, rows=None, natural=False, categorical=False,
+             unscaled_decimals=False):
+        """Reads rows into a pandas DataFrame.
+
+        categorical may be True or a list of column names; dictionary encoded
+        pages of those columns are returned as a pd.Categorical built from the
+        dictionary indices, without looking up each value.
+
+        DECIMAL columns are divided by 10**scale into floats (or Decimal
+        objects above 18 digits of precision) unless unscaled_decimals is
+        true, in which case their unscaled integers are returned.
+        """
         if columns:
             for c in columns:
                 if c not in self._cols:
                     raise ValueError("Unknown column {}".format(c))
 
         columns = columns or self._cols
+        if categorical is True:
+            categorical = columns
+        categorical = set(categorical or [])
         res = defaultdict(list)
 
         if natural and rows is not None:
@@ -170,13 +377,31 @@ class ParquetReader(object):
             rg = self._rg[self._row_group_index]
             cg = rg.columns
             rows_read = 0
+            selected = []
             for col in cg:
                 name, width = self._get_column_info(col)
                 if name not in columns:
                     continue
+                nested = self._schema_helper.max_repetition_level(
+                    col.meta_data.path_in_schema) > 0
+                selected.append((col, name, width,
+                                 name in categorical and not nested))
+            self._read_column_chunks([col for col, _, _, _ in selected])
+            pages = {}
+            if self._executor is not None:
+                # read the pages of every column chunk before waiting for any
+                # of them to be decoded; with a row limit this may decode
+                # pages past it
+                for col, name, width, dictionary_indices in selected:
+                    pages[name] = list(self._column_pages(
+                        col, width, self._column_group_locations[name],
+                        natural, dictionary_indices))
+            for col, name, width, dictionary_indices in selected:
                 row_data = self._read_rows_in_group(col, name, width,
-                                                    rg, remaining_rows, natural)
-                res[name] += row_data
+                                                    rg, remaining_rows, natural,
+                                                    dictionary_indices,
+                                                    pages.get(name))
+                res[name].append(row_data)
                 if rows_read == 0 and len(row_data):
                     rows_read = len(row_data)
 
@@ -190,19 +415,74 @@ class ParquetReader(object):
 
             self._row_group_index += 1
 
-        return self._make_dataframe(res, columns)
-
-    def _make_dataframe(self, res, columns):
-        if len(res) == 0:
-            for name in columns:
-                res[name] = []
-
-        out = pd.DataFrame(res, columns=columns)
-
-        for col in columns:
-            match = [s for s in self._schema if col == s.name]
-            if len(match):
-                schema = match[0]
-                if schema.converted_type:
-                    out[col] = convert_column(out[col], schema)
-        return out
+        return self._make_dataframe(res, columns, unscaled_decimals)
+
+    def pipeline(self, columns=None, categorical=False,
+                 unscaled_decimals=False, **options):
+        """Returns a ReadPipeline over the row groups of the file: a read mode
+        in which fetching, decompressing and decoding run concurrently in
+        stages connected by bounded queues. Iterate over it for a DataFrame
+        per row group, or call its read method for one DataFrame. options
+        are queue_size, decompress_workers and decode_workers."""
+        # imported here, as the pipeline is built on this module
+        from .pipeline import ReadPipeline
+        return ReadPipeline(self, columns, categorical, unscaled_decimals,
+                            **options)
+
+    def _make_dataframe(self, res, columns, unscaled_decimals=False):
+        data = {}
+        for name in columns:
+            values = _concat(res.get(name, []))
+            if isinstance(values, DictionaryArray):
+                categories = self._convert_values(values.dictionary, name,
+                                                  unscaled_decimals)
+                values = pd.Categorical.from_codes(values.indices, categories)
+            elif isinstance(values, ListArray):
+                flat_values = self._convert_values(values.flat_values(), name,
+                                                   unscaled_decimals)
+                values = values.with_flat_values(flat_values).to_numpy()
+            else:
+                values = self._convert_values(values, name, unscaled_decimals)
+            data[name] = values
+
+        return pd.DataFrame(data, columns=columns)
+
+    def _convert_values(self, values, name, unscaled_decimals=False):
+        """Turns decoded values of the named column into an array or series
+        pandas can hold, applying the column's converted type. Masked arrays
+        become pandas nullable arrays."""
+        binary = isinstance(values, ByteArray)
+        mask = None
+        if isinstance(values, np.ma.MaskedArray):
+            mask = np.ma.getmaskarray(values)
+            if mask.dtype.names:
+                # structured (INT96) values are masked field by field
+                mask = mask[mask.dtype.names[0]]
+            values = values.data
+        if not binary and values.dtype in _FRAME_DTYPES:
+            values = values.astype(_FRAME_DTYPES[values.dtype])
+        schemae = self._schema[name]
+        if schemae.type == Type.INT96:
+            values = self._convert_int96(values, name)
+        elif schemae.converted_type is not None:
+            # pandas would strip trailing null bytes from 'S' values
+            if not binary and values.dtype.kind != 'S':
+                values = pd.Series(values)
+            values = convert_column(values, schemae, unscaled_decimals)
+        elif binary:
+            values = values.to_numpy()
+        elif values.dtype.kind == 'S':
+            values = ByteArray.from_fixed(values).to_numpy()
+        if mask is not None:
+            values = to_pandas(values, mask)
+        return values
+
+    def _convert_int96(self, values, name):
+        """INT96 columns carry no converted type, but in practice hold
+        timestamps; files written by spark list which ones in their footer
+        metadata. Other INT96 columns are left as raw 12 byte values."""
+        if self._spark_timestamps is None or name in self._spark_timestamps:
+            return int96_to_datetime64(values)
+        if values.dtype.names is None:
+            return values
+        return ByteArray.from_fixed(values).to_numpy()
@@ -7,33 +7,70 @@ class SchemaHelper(object):
 
     def __init__(self, schema_elements):
         self.schema_elements = schema_elements
+        # the flattened schema is a depth first walk of the tree; nested
+        # fields may share names (e.g. "element" in lists), so elements are
+        # keyed by their full path below the root.
+        self.schema_elements_by_path = {}
+        self.leaves = []
+        stack = []
+        for se in schema_elements[1:]:
+            while stack and stack[-1][1] == 0:
+                stack.pop()
+            if stack:
+                stack[-1][1] -= 1
+            path = tuple(s[0] for s in stack) + (se.name,)
+            self.schema_elements_by_path[path] = se
+            if se.num_children:
+                stack.append([se.name, se.num_children])
+            else:
+                self.leaves.append(path)
         self.schema_elements_by_name = dict(
             [(se.name, se) for se in schema_elements])
-        assert len(self.schema_elements) == len(self.schema_elements_by_name)
 
     def schema_element(self, name):
-        """Get the schema element with the given name."""
-        return self.schema_elements_by_name[name]
+        """Get the schema element with the given path, or with the given name
+        if it is unique."""
+        if isinstance(name, (list, tuple)):
+            return self.schema_elements_by_path[tuple(name)]
+        return self.schema_elements_by_path.get(
+            (name,), self.schema_elements_by_name[name])
 
     def is_required(self, name):
-        """Returns true iff the schema element with the given name is
+        """Returns true iff the schema element with the given path or name is
         required"""
         return self.schema_element(name).repetition_type == FieldRepetitionType.REQUIRED
 
+    def is_repeated(self, name):
+        """Returns true iff the schema element with the given path or name is
+        repeated"""
+        return self.schema_element(name).repetition_type == FieldRepetitionType.REPEATED
+
     def max_repetition_level(self, path):
         """get the max repetition level for the given schema path."""
         max_level = 0
-        for part in path:
-            se = self.schema_element(part)
-            if se.repetition_type == FieldRepetitionType.REQUIRED:
+        for i in range(len(path)):
+            if self.is_repeated(path[:i + 1]):
                 max_level += 1
         return max_level
 
     def max_definition_level(self, path):
         """get the max definition level for the given schema path."""
         max_level = 0
-        for part in path:
-            se = self.schema_element(part)
-            if se.repetition_type != FieldRepetitionType.REQUIRED:
+        for i in range(len(path)):
+            if not self.is_required(path[:i + 1]):
                 max_level += 1
         return max_level
+
+    def list_levels(self, path):
+        """Returns a (parent definition level, definition level) pair for each
+        repeated field on the given schema path, outermost first. A list is
+        null below its parent's level and empty below its own."""
+        levels = []
+        max_level = 0
+        for i in range(len(path)):
+            if self.is_required(path[:i + 1]):
+                continue
+            max_level += 1
+            if self.is_repeated(path[:i + 1]):
+                levels.append((max_level - 1, max_level))
+        return levels
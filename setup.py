@@ -22,7 +22,11 @@ setup(
     ],
     tests_require=['pytest',],
     extras_require={
-        'snappy support': ['python-snappy']
+        'snappy support': ['python-snappy'],
+        'zstd support': ['zstandard'],
+        'lz4 support': ['lz4'],
+        'brotli support': ['brotli'],
+        'decompress into buffers': ['cramjam'],
     },
     entry_points={
         'console_scripts': [
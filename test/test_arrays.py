@@ -0,0 +1,122 @@
+import unittest
+
+import numpy as np
+
+from parquet.arrays import (ByteArray, DictionaryArray, ListArray, fill_nulls,
+                            to_pandas)
+
+
+class TestNulls(unittest.TestCase):
+
+    def test_fill_nulls_numeric(self):
+        valid = np.array([True, False, False, True])
+        arr = fill_nulls(np.array([7, 8], dtype=np.int32), valid)
+        self.assertEqual(np.int32, arr.dtype)
+        self.assertEqual([7, None, None, 8], arr.tolist())
+
+    def test_fill_nulls_object(self):
+        values = np.array([b"a"], dtype=object)
+        arr = fill_nulls(values, np.array([False, True]))
+        self.assertEqual([None, b"a"], arr.tolist())
+
+    def test_to_pandas(self):
+        mask = np.array([False, True])
+        self.assertEqual("Int64", to_pandas(np.array([1, 2]), mask).dtype)
+        self.assertEqual("Float64", to_pandas(np.array([1.5, 2]), mask).dtype)
+        self.assertEqual("boolean",
+                         to_pandas(np.array([True, False]), mask).dtype)
+
+
+class TestByteArray(unittest.TestCase):
+
+    values = [b"foo", b"", b"barbaz", b"\xff"]
+
+    def test_from_values(self):
+        arr = ByteArray.from_values(self.values)
+        self.assertEqual(4, len(arr))
+        self.assertEqual([0, 3, 3, 9, 10], arr.offsets.tolist())
+        self.assertEqual(self.values, arr.tolist())
+        self.assertEqual(b"\xff", arr[-1])
+
+    def test_decode(self):
+        arr = ByteArray.from_values([b"caf\xc3\xa9", b"x"])
+        self.assertEqual([u"caf\xe9", u"x"], arr.tolist('utf-8'))
+
+    def test_slice_shares_data(self):
+        arr = ByteArray.from_values(self.values)
+        part = arr[1:3]
+        self.assertIs(arr.data, part.data)
+        self.assertEqual([b"", b"barbaz"], part.tolist())
+
+    def test_take(self):
+        arr = ByteArray.from_values(self.values)
+        self.assertEqual([b"barbaz", b"foo", b"barbaz"],
+                         arr.take([2, 0, 2]).tolist())
+        self.assertEqual([b"\xff", b""], arr.take([-1, 1]).tolist())
+        self.assertEqual([], arr.take([]).tolist())
+        with self.assertRaises(IndexError):
+            arr.take([len(self.values)])
+
+    def test_concat(self):
+        arr = ByteArray.from_values(self.values)
+        out = ByteArray.concat([arr[2:], arr[:1]])
+        self.assertEqual([b"barbaz", b"\xff", b"foo"], out.tolist())
+
+    def test_with_nulls(self):
+        arr = ByteArray.from_values([b"a", b"bc"])
+        out = arr.with_nulls(np.array([False, True, False, True]))
+        self.assertEqual([None, b"a", None, b"bc"], out.tolist())
+        self.assertEqual([None, b"bc"], out[2:].tolist())
+
+
+class TestDictionaryArray(unittest.TestCase):
+
+    def test_decode(self):
+        arr = DictionaryArray(np.array([1, -1, 0], dtype=np.int32),
+                              ByteArray.from_values([b"a", b"b"]))
+        self.assertEqual([b"b", None, b"a"], arr.tolist())
+
+    def test_concat_same_dictionary(self):
+        dictionary = np.array([10, 20])
+        a = DictionaryArray(np.array([0, 1], dtype=np.int32), dictionary)
+        b = DictionaryArray(np.array([1], dtype=np.int32), dictionary.copy())
+        out = DictionaryArray.concat([a, b])
+        self.assertIs(dictionary, out.dictionary)
+        self.assertEqual([0, 1, 1], out.indices.tolist())
+
+    def test_concat_merges_dictionaries(self):
+        a = DictionaryArray(np.array([0, 1], dtype=np.int32),
+                            ByteArray.from_values([b"x", b"y"]))
+        b = DictionaryArray(np.array([1, -1, 0], dtype=np.int32),
+                            ByteArray.from_values([b"z", b"x"]))
+        out = DictionaryArray.concat([a, b])
+        self.assertEqual([b"x", b"y", b"z"], out.dictionary.tolist())
+        self.assertEqual([0, 1, 0, -1, 2], out.indices.tolist())
+
+
+class TestListArray(unittest.TestCase):
+
+    def test_from_levels(self):
+        # optional list of optional ints: [[1, 2], None, [], [None, 3]]
+        rep = np.array([0, 1, 0, 0, 0, 1])
+        defs = np.array([3, 3, 0, 1, 2, 3])
+        arr = ListArray.from_levels(rep, defs, [(1, 2)],
+                                    np.array([1, 2, 3]), 3)
+        self.assertEqual([0, 2, 2, 2, 4], arr.offsets.tolist())
+        self.assertEqual([[1, 2], None, [], [None, 3]], arr.tolist())
+
+    def test_from_levels_nested(self):
+        # [[[1], []], [[2, 3]], None] with required leaves
+        rep = np.array([0, 1, 0, 2, 0])
+        defs = np.array([4, 3, 4, 4, 0])
+        arr = ListArray.from_levels(rep, defs, [(1, 2), (3, 4)],
+                                    np.array([1, 2, 3]), 4)
+        self.assertEqual([[[1], []], [[2, 3]], None], arr.tolist())
+
+    def test_slice_and_concat(self):
+        arr = ListArray(np.array([0, 2, 2, 3]), np.array([1, 2, 3]),
+                        np.array([False, True, False]))
+        self.assertEqual([None, [3]], arr[1:].tolist())
+        self.assertEqual([1, 2], arr[0])
+        self.assertEqual([[3], [1, 2], None],
+                         ListArray.concat([arr[2:], arr[:2]]).tolist())
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+import pandas as pd
+
+from parquet import AsyncBaseFileSystem, AsyncParquetReader, LocalFileSystem
+from parquet import ParquetReader
+from parquet.async_reader import read_files
+from parquet.main import ParquetFormatException
+
+
+class SlowFileSystem(AsyncBaseFileSystem):
+    """Local files behind an async file system with latency, recording how
+    many requests are in flight."""
+
+    def __init__(self, latency=0.01):
+        self._fs = LocalFileSystem()
+        self._latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _request(self, fn, *args):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self._latency)
+            return fn(*args)
+        finally:
+            self.in_flight -= 1
+
+    async def is_dir(self, path):
+        return self._fs.is_dir(path)
+
+    async def size(self, path):
+        return await self._request(self._fs.size, path)
+
+    async def read_ranges(self, path, ranges):
+        return await self._request(self._fs.read_ranges, path, ranges)
+
+
+class TestAsyncParquetReader(unittest.TestCase):
+
+    def test_read(self):
+        async def read(name):
+            reader = await AsyncParquetReader.open('test-data/' + name)
+            return await reader.read()
+
+        for name in ['nation.impala.parquet', 'datapage_v2.snappy.parquet',
+                     'nested.parquet', 'strings.dict.parquet',
+                     'nation.dict.parquet']:
+            expected = ParquetReader('test-data/' + name).read()
+            pd.testing.assert_frame_equal(asyncio.run(read(name)), expected)
+
+    def test_read_rows(self):
+        async def read():
+            reader = await AsyncParquetReader.open(
+                'test-data/datapage_v2.parquet', SlowFileSystem())
+            first = await reader.read(rows=100)
+            return first, await reader.read()
+
+        first, rest = asyncio.run(read())
+        expected = ParquetReader('test-data/datapage_v2.parquet').read()
+        self.assertEqual(100, len(first))
+        pd.testing.assert_frame_equal(
+            pd.concat([first, rest], ignore_index=True), expected)
+
+    def test_row_groups(self):
+        async def read():
+            reader = await AsyncParquetReader.open(
+                'test-data/categories.parquet')
+            return [await reader.read(rows=rows) for rows in [2, 3, None]]
+
+        frames = asyncio.run(read())
+        expected = ParquetReader('test-data/categories.parquet').read()
+        self.assertEqual([2, 3, 1], [len(frame) for frame in frames])
+        pd.testing.assert_frame_equal(
+            pd.concat(frames, ignore_index=True), expected)
+
+    def test_read_files(self):
+        fs = SlowFileSystem()
+        paths = ['test-data/nation.impala.parquet'] * 20
+        frames = asyncio.run(read_files(paths, fs, max_concurrency=8))
+        expected = ParquetReader('test-data/nation.impala.parquet').read()
+        for frame in frames:
+            pd.testing.assert_frame_equal(frame, expected)
+        self.assertGreater(fs.max_in_flight, 1)
+        self.assertLessEqual(fs.max_in_flight, 8)
+
+    def test_invalid_file(self):
+        async def read():
+            await AsyncParquetReader.open('test-data/nation.csv')
+
+        with self.assertRaises(ParquetFormatException):
+            asyncio.run(read())
@@ -0,0 +1,108 @@
+import io
+import unittest
+
+import numpy as np
+import snappy
+
+from parquet import MappedFile, ParquetMain, ParquetReader, compression
+from parquet.buffers import BufferPool, BufferReader
+from parquet.schema import SchemaHelper
+from parquet.ttypes import CompressionCodec
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_reuse(self):
+        pool = BufferPool()
+        view = pool.get(100)
+        self.assertEqual(100, len(view))
+        self.assertEqual(128, len(view.obj))
+        pool.release(view)
+        # a smaller request is served from the released buffer
+        self.assertIs(view.obj, pool.get(50).obj)
+        # but it isn't handed out twice
+        self.assertIsNot(view.obj, pool.get(50).obj)
+
+    def test_max_buffers(self):
+        pool = BufferPool(max_buffers=1)
+        first, second = pool.get(10), pool.get(10)
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(1, len(pool._free))
+
+
+class TestBufferReader(unittest.TestCase):
+
+    def test_read(self):
+        reader = BufferReader(b"abcdef")
+        self.assertEqual(b"ab", reader.read(2))
+        self.assertIsInstance(reader.read(1), memoryview)
+        self.assertEqual(3, reader.tell())
+        self.assertEqual(6, reader.seek(0, io.SEEK_END))
+        self.assertEqual(b"", reader.read(1))
+        reader.seek(-2, io.SEEK_CUR)
+        self.assertEqual(b"ef", reader.read())
+
+
+class TestMappedFile(unittest.TestCase):
+
+    def test_read(self):
+        with open('test-data/nation.plain.parquet', 'rb') as f:
+            expected = f.read()
+        with MappedFile('test-data/nation.plain.parquet') as f:
+            self.assertEqual(b"PAR1", f.read(4))
+            self.assertIsInstance(f.read(4), memoryview)
+            f.seek(-4, io.SEEK_END)
+            self.assertEqual(expected[-4:], f.read())
+
+    def test_zero_copy_pages(self):
+        # uncompressed plain pages are decoded from the mapping itself
+        main = ParquetMain()
+        f = MappedFile('test-data/nation.plain.parquet')
+        footer = main.read_footer(f.name, f)
+        cmd = footer.row_groups[0].columns[0].meta_data
+        f.seek(main._get_offset(cmd))
+        ph = main._read_page_header(f)
+        values = main.read_data_page(f, SchemaHelper(footer.schema), ph, cmd,
+                                     None)
+        self.assertEqual(list(range(25)), values.tolist())
+        self.assertIsInstance(values.base, memoryview)
+        # arrays keep the mapping alive after the file is closed
+        f.close()
+        self.assertEqual(list(range(25)), values.tolist())
+
+
+class TestDecompressInto(unittest.TestCase):
+
+    data = b"parquet " * 100
+
+    def test_decompress_into(self):
+        out = bytearray(len(self.data))
+        self.assertEqual(len(self.data), compression.decompress_into(
+            snappy.compress(self.data), CompressionCodec.SNAPPY, out))
+        self.assertEqual(self.data, out)
+
+    def test_fallback(self):
+        # codecs without an into function are decompressed and copied
+        out = np.empty(len(self.data), dtype=np.uint8)
+        self.assertEqual(len(self.data), compression.decompress_into(
+            self.data, CompressionCodec.UNCOMPRESSED, memoryview(out)))
+        self.assertEqual(self.data, out.tobytes())
+
+    def test_wrong_size(self):
+        out = bytearray(len(self.data) + 1)
+        self.assertEqual(len(self.data), compression.decompress_into(
+            snappy.compress(self.data), CompressionCodec.SNAPPY, out))
+
+
+class TestPooledPages(unittest.TestCase):
+
+    def test_values_outlive_buffers(self):
+        # decoded values must not be views into buffers the pool reuses
+        expected = ParquetReader('test-data/datapage_v2.parquet').read()
+        reader = ParquetReader('test-data/datapage_v2.snappy.parquet')
+        frame = reader.read()
+        self.assertTrue(reader._main._buffer_pool._free)
+        for column in expected:
+            self.assertEqual(expected[column].tolist(),
+                             frame[column].tolist())
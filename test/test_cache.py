@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from parquet import BlockCache, CachingFileSystem, FooterCache
+from parquet import LocalFileSystem, ParquetMain, ParquetReader
+
+
+class CountingFileSystem(LocalFileSystem):
+
+    def __init__(self):
+        super(CountingFileSystem, self).__init__()
+        self.requested = []
+        self.lookups = 0
+
+    def size_and_version(self, path):
+        self.lookups += 1
+        return super(CountingFileSystem, self).size_and_version(path)
+
+    def read_ranges(self, path, ranges):
+        self.requested.extend(ranges)
+        return super(CountingFileSystem, self).read_ranges(path, ranges)
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = BlockCache(max_bytes=10)
+        cache.put('a', b'12345')
+        cache.put('b', b'12345')
+        self.assertEqual(b'12345', cache.get('a'))
+        cache.put('c', b'12345')
+        # b was the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(b'12345', cache.get('a'))
+        self.assertEqual(b'12345', cache.get('c'))
+        stats = cache.stats()
+        self.assertEqual((3, 1, 1, 10), (stats['hits'], stats['misses'],
+                                         stats['evictions'], stats['bytes']))
+
+    def test_spill(self):
+        spill_dir = tempfile.mkdtemp()
+        try:
+            cache = BlockCache(max_bytes=5, spill_dir=spill_dir,
+                               spill_max_bytes=5)
+            cache.put('a', b'12345')
+            cache.put('b', b'67890')
+            self.assertEqual(1, len(os.listdir(spill_dir)))
+            self.assertEqual(b'12345', cache.get('a'))
+            self.assertEqual(1, cache.stats()['spill_hits'])
+            # reading a back spilled b
+            self.assertEqual(b'67890', cache.get('b'))
+            cache.put('c', b'abcde')
+            cache.put('d', b'fghij')
+            # only one block fits on disk too
+            self.assertEqual(1, len(os.listdir(spill_dir)))
+            cache.clear()
+            self.assertEqual([], os.listdir(spill_dir))
+        finally:
+            shutil.rmtree(spill_dir)
+
+
+class TestFooterCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'nation.parquet')
+        shutil.copy('test-data/nation.impala.parquet', self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_lru(self):
+        cache = FooterCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual({'hits': 2, 'misses': 1, 'entries': 2},
+                         cache.stats())
+
+    def test_parquet_reader(self):
+        cache = FooterCache()
+        fs = CountingFileSystem()
+        expected = ParquetReader(self.path, fs=fs, footer_cache=cache)
+        # the tail of the file holds the whole footer
+        self.assertEqual(1, len(fs.requested))
+        for _ in range(2):
+            reader = ParquetReader(self.path, fs=fs, footer_cache=cache)
+            self.assertIs(expected._footer, reader._footer)
+        self.assertEqual(1, len(fs.requested))
+        self.assertEqual(2, cache.stats()['hits'])
+
+    def test_shared_with_parquet_main(self):
+        footer = ParquetMain().read_footer(self.path)
+        self.assertIs(footer, ParquetReader(self.path)._footer)
+
+    def test_footer_not_modified(self):
+        cache = FooterCache()
+        reader = ParquetReader('test-data/fixed.parquet', footer_cache=cache)
+        reader.read()
+        reader.pipeline().read()
+        for rg in reader._footer.row_groups:
+            for col in rg.columns:
+                self.assertFalse(hasattr(col.meta_data, 'width'))
+
+    def test_changed_file(self):
+        cache = FooterCache()
+        footer = ParquetReader(self.path, footer_cache=cache)._footer
+        shutil.copy('test-data/nation.dict.parquet', self.path)
+        reader = ParquetReader(self.path, footer_cache=cache)
+        self.assertIsNot(footer, reader._footer)
+        self.assertEqual(2, cache.stats()['misses'])
+
+
+class TestCachingFileSystem(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'nation.parquet')
+        shutil.copy('test-data/nation.impala.parquet', self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read_ranges(self):
+        inner = CountingFileSystem()
+        fs = CachingFileSystem(inner, BlockCache(), block_size=1000)
+        with open(self.path, 'rb') as f:
+            expected = f.read()
+        ranges = [(0, 4), (990, 20), (len(expected) - 8, 8)]
+        for _ in range(2):
+            self.assertEqual([expected[o:o + n] for o, n in ranges],
+                             [bytes(v) for v in fs.read_ranges(self.path,
+                                                               ranges)])
+        # blocks 0 and 1 and the last one, once
+        last = (len(expected) - 1) // 1000
+        self.assertEqual([(0, 1000), (1000, 1000),
+                          (last * 1000, len(expected) - last * 1000)],
+                         inner.requested)
+        with self.assertRaises(IOError):
+            fs.read_ranges(self.path, [(len(expected) - 4, 8)])
+
+    def test_parquet_reader(self):
+        cache = BlockCache()
+        fs = CachingFileSystem(CountingFileSystem(), cache, block_size=4096)
+        expected = ParquetReader(self.path).read()
+        pd.testing.assert_frame_equal(
+            ParquetReader(self.path, fs=fs).read(), expected)
+        requested = len(fs.fs.requested)
+        misses = cache.stats()['misses']
+        # later readers are served from memory
+        for _ in range(2):
+            pd.testing.assert_frame_equal(
+                ParquetReader(self.path, fs=fs).read(), expected)
+        self.assertEqual(requested, len(fs.fs.requested))
+        self.assertEqual(misses, cache.stats()['misses'])
+        self.assertGreater(cache.stats()['hits'], 0)
+
+    def test_changed_file(self):
+        fs = CachingFileSystem(LocalFileSystem(), BlockCache(), version_ttl=0)
+        self.assertEqual(b'PAR1', bytes(fs.read_ranges(self.path,
+                                                       [(0, 4)])[0]))
+        with open(self.path, 'wb') as f:
+            f.write(b'changed')
+        self.assertEqual(b'chan', bytes(fs.read_ranges(self.path,
+                                                       [(0, 4)])[0]))
+
+    def test_version_ttl(self):
+        inner = CountingFileSystem()
+        fs = CachingFileSystem(inner, BlockCache(), version_ttl=60,
+                               max_files=1)
+        for _ in range(3):
+            fs.read_ranges(self.path, [(0, 4)])
+        self.assertEqual(1, inner.lookups)
+        # the least recently used file is forgotten
+        fs.size('test-data/nation.impala.parquet')
+        fs.read_ranges(self.path, [(0, 4)])
+        self.assertEqual(3, inner.lookups)
@@ -0,0 +1,39 @@
+import gzip
+import struct
+import unittest
+
+import lz4.block
+
+from parquet import compression
+from parquet.ttypes import CompressionCodec
+
+
+class TestCompression(unittest.TestCase):
+
+    data = b"parquet " * 100
+
+    def test_gzip(self):
+        compressed = gzip.compress(self.data)
+        self.assertEqual(self.data, compression.decompress(
+            compressed, CompressionCodec.GZIP, len(self.data)))
+        # concatenated members
+        self.assertEqual(self.data * 2, compression.decompress(
+            compressed * 2, CompressionCodec.GZIP, 2 * len(self.data)))
+
+    def test_lz4_hadoop(self):
+        block = lz4.block.compress(self.data, store_size=False)
+        framed = struct.pack(">II", len(self.data), len(block)) + block
+        self.assertEqual(self.data * 2, compression.decompress(
+            framed * 2, CompressionCodec.LZ4, 2 * len(self.data)))
+        # raw blocks are accepted too
+        self.assertEqual(self.data, compression.decompress(
+            block, CompressionCodec.LZ4, len(self.data)))
+
+    def test_register_codec(self):
+        compression.register_codec(
+            CompressionCodec.LZO, lambda data, size: bytes(data[::-1]))
+        try:
+            self.assertEqual(b"cba", compression.decompress(
+                memoryview(b"abc"), CompressionCodec.LZO, 3))
+        finally:
+            del compression.decompressors[CompressionCodec.LZO]
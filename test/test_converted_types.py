@@ -0,0 +1,67 @@
+import decimal
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from parquet.arrays import ByteArray
+from parquet.converted_types import (convert_column, decode_decimal,
+                                     int96_to_datetime64, types)
+from parquet.encoding import PLAIN_DTYPES
+from parquet.ttypes import SchemaElement, Type
+
+
+def _be(value, width):
+    return value.to_bytes(width, 'big', signed=True)
+
+
+class TestDecodeDecimal(unittest.TestCase):
+
+    def test_fixed_width(self):
+        data = np.array([_be(-2, 2), _be(16, 2)], dtype='S2')
+        self.assertEqual([-0.2, 1.6], decode_decimal(data, 1, 4).tolist())
+        self.assertEqual([-2, 16], decode_decimal(data, 1, 4, True).tolist())
+
+    def test_variable_width(self):
+        values = [_be(-5, 1), _be(1234, 2), _be(-70000, 3)]
+        res = decode_decimal(ByteArray.from_values(values), 2, 9)
+        self.assertEqual([-0.05, 12.34, -700.0], res.tolist())
+
+    def test_nulls(self):
+        data = np.array([_be(-2, 2), None, _be(16, 2)], dtype=object)
+        res = decode_decimal(data, 0, 4)
+        self.assertEqual("Float64", res.dtype)
+        self.assertEqual([False, True, False], res.isnull().tolist())
+
+    def test_wide(self):
+        values = [2 ** 100 + 3, -(2 ** 90), -1]
+        data = ByteArray.from_values([_be(v, 14) for v in values])
+        self.assertEqual(values, decode_decimal(data, 3, 38, True).tolist())
+        self.assertEqual([decimal.Decimal(v).scaleb(-3, decimal.Context(prec=39))
+                          for v in values],
+                         decode_decimal(data, 3, 38).tolist())
+
+
+class TestTemporal(unittest.TestCase):
+
+    def test_int96(self):
+        # 1970-01-02 00:00:01.5 and 1969-12-31 12:00:00
+        data = np.array([(1500000000, 2440589), (43200 * 10 ** 9, 2440587)],
+                        dtype=PLAIN_DTYPES[Type.INT96])
+        self.assertEqual(
+            [pd.Timestamp('1970-01-02 00:00:01.5'),
+             pd.Timestamp('1969-12-31 12:00:00')],
+            list(int96_to_datetime64(data)))
+        for data in [np.empty(0, dtype=PLAIN_DTYPES[Type.INT96]),
+                     np.empty(0, dtype=object)]:
+            out = int96_to_datetime64(data)
+            self.assertEqual((0, 'datetime64[ns]'), (len(out), out.dtype))
+
+    def test_times(self):
+        for name, values in [('TIME_MILLIS', [1500, -1]),
+                             ('TIME_MICROS', [1500000, -1000])]:
+            schemae = SchemaElement(converted_type=types[name])
+            res = convert_column(pd.Series(values), schemae)
+            self.assertEqual('timedelta64[ns]', res.dtype)
+            self.assertEqual(pd.Timedelta(seconds=1.5), res[0])
+            self.assertEqual(pd.Timedelta(milliseconds=-1), res[1])
@@ -55,11 +55,11 @@ class TestPlain(unittest.TestCase):
         data = b"foobar"
         fo = BytesIO(data)
         self.assertEquals(
-            data[:3].decode('utf-8'),
+            data[:3],
             reader.read_plain_byte_array_fixed(
                 fo, 3))
         self.assertEquals(
-            data[3:].decode('utf-8'),
+            data[3:],
             reader.read_plain_byte_array_fixed(
                 fo, 3))
 
@@ -68,19 +68,78 @@ class TestPlain(unittest.TestCase):
         data = b"foobar"
         fo = BytesIO(data)
         self.assertEquals(
-            data[:3].decode('utf-8'),
+            data[:3],
             reader.read_plain(
                 fo, Type.FIXED_LEN_BYTE_ARRAY, 3))
 
+    def test_int32_array(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(struct.pack("<3i", 1, -2, 999))
+        out = reader.read_plain_array(fo, Type.INT32, None, 3)
+        self.assertEquals('int32', out.dtype.name)
+        self.assertEquals([1, -2, 999], out.tolist())
+
+    def test_double_array(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(struct.pack("<2d", 9.99, -1.5) + b"tail")
+        out = reader.read_plain_array(fo, Type.DOUBLE, None, 2)
+        self.assertEquals('float64', out.dtype.name)
+        self.assertEquals([9.99, -1.5], out.tolist())
+        self.assertEquals(b"tail", fo.read())
+
+    def test_byte_array_page(self):
+        reader = parquet.encoding.Encoding(1)
+        data = b"".join(struct.pack("<i", len(v)) + v
+                        for v in [b"foo", b"", b"\xffbar"])
+        fo = BytesIO(data + b"tail")
+        out = reader.read_plain_array(fo, Type.BYTE_ARRAY, None, 3)
+        self.assertEquals([0, 3, 3, 7], out.offsets.tolist())
+        self.assertEquals(b"foo\xffbar", out.data.tobytes())
+        self.assertEquals([b"foo", b"", b"\xffbar"], out.tolist())
+        self.assertEquals(b"tail", fo.read())
+
+    def test_fixed_array(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(b"ab\x00c\x00\x00tail")
+        out = reader.read_plain_array(fo, Type.FIXED_LEN_BYTE_ARRAY, 2, 3)
+        self.assertEquals('S2', out.dtype.str[1:])
+        self.assertEquals(b"ab\x00c\x00\x00", out.tobytes())
+        self.assertEquals(b"tail", fo.read())
+
+    def test_byte_array_page_truncated(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(struct.pack("<i", 10) + b"short")
+        self.assertRaises(ValueError, reader.read_plain_array, fo,
+                          Type.BYTE_ARRAY, None, 1)
+
     def test_boolean(self):
         reader = parquet._optimized.BinaryReader()
-        raw_data_in = [0b00000110]
-        encoded_bitstring = array.array('B', raw_data_in).tostring()
+        raw_data_in = [0b00000110, 0b00000001]
+        encoded_bitstring = array.array('B', raw_data_in).tobytes()
         fo = BytesIO(encoded_bitstring)
+        # each value is read on its own, so no bits are carried over
         self.assertFalse(reader.read_plain_boolean(fo))
         self.assertTrue(reader.read_plain_boolean(fo))
-        self.assertTrue(reader.read_plain_boolean(fo))
-        self.assertFalse(reader.read_plain_boolean(fo))
+        self.assertEqual(b"", fo.read())
+
+
+    def test_boolean_array(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(array.array('B', [0b00000110, 0b00000011]).tobytes())
+        out = reader.read_plain_array(fo, Type.BOOLEAN, None, 10)
+        self.assertEquals('bool', out.dtype.name)
+        self.assertEquals([False, True, True, False, False, False, False,
+                           False, True, True], out.tolist())
+        self.assertEquals(b"", fo.read())
+
+    def test_boolean_array_no_carry_over(self):
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(array.array('B', [0b00000001, 0b00000010]).tobytes())
+        self.assertEquals(
+            [True], reader.read_plain_array(fo, Type.BOOLEAN, None, 1).tolist())
+        self.assertEquals(
+            [False, True],
+            reader.read_plain_array(fo, Type.BOOLEAN, None, 2).tolist())
 
 
 class TestRle(unittest.TestCase):
@@ -92,6 +151,105 @@ class TestRle(unittest.TestCase):
         self.assertEquals([1 << 30] * 2, list(out))
 
 
+class TestRleBitPackedHybrid(unittest.TestCase):
+
+    # an rle run of three 5s followed by a bit-packed run of 0..7 (width 3)
+    data = struct.pack("<BB", 3 << 1, 5) + struct.pack(
+        "<BBBB", (1 << 1) | 1, 0b10001000, 0b11000110, 0b11111010)
+
+    def testMixedRuns(self):
+        reader = parquet.encoding.Encoding(3)
+        fo = BytesIO(struct.pack("<i", len(self.data)) + self.data)
+        out = reader.read_rle_bit_packed_hybrid(fo)
+        self.assertEquals('int32', out.dtype.name)
+        self.assertEquals([5, 5, 5] + list(range(8)), out.tolist())
+
+    def testCount(self):
+        reader = parquet.encoding.Encoding(3)
+        fo = BytesIO(self.data)
+        out = reader.read_rle_bit_packed_hybrid(fo, len(self.data), 5)
+        self.assertEquals([5, 5, 5, 0, 1], out.tolist())
+
+    def testShortData(self):
+        reader = parquet.encoding.Encoding(3)
+        fo = BytesIO(self.data)
+        out = reader.read_rle_bit_packed_hybrid(fo, len(self.data), 20)
+        self.assertEquals(11, len(out))
+
+    def testOversizedRun(self):
+        reader = parquet._optimized.BinaryReader()
+        # a bit-packed run of 2 ** 30 groups, whose byte count overflows an
+        # int, followed by far fewer bytes
+        header = (0x40000000 << 1) | 1
+        varint = bytes([(header >> s) & 0x7F | (0x80 if s < 28 else 0)
+                        for s in range(0, 35, 7)])
+        for count in [100, None]:
+            self.assertRaises(ValueError, reader.read_rle_bit_packed_hybrid,
+                              varint + b"\xff" * 64, 2, count)
+
+    def testTruncatedRleValue(self):
+        reader = parquet._optimized.BinaryReader()
+        # an rle run of 16-bit values with only one byte of its value
+        self.assertRaises(ValueError, reader.read_rle_bit_packed_hybrid,
+                          struct.pack("<BB", 10 << 1, 1), 16, 5)
+        self.assertRaises(ValueError, reader.read_rle, BytesIO(b"\x01"),
+                          10 << 1, 2)
+
+
+class TestDeltaBinaryPacked(unittest.TestCase):
+
+    def testConstantDelta(self):
+        # block of 128 values in 4 miniblocks, 5 values, first value 1, every
+        # delta 1 so all miniblocks have bit width 0.
+        data = array.array('B', [0x80, 0x01, 4, 5, 2, 2, 0, 0, 0, 0]).tobytes()
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(data)
+        out = reader.read_delta_binary_packed(fo, Type.INT32)
+        self.assertEquals('int32', out.dtype.name)
+        self.assertEquals([1, 2, 3, 4, 5], out.tolist())
+        self.assertEquals(len(data), fo.tell())
+
+    def testNegativeDeltas(self):
+        # 7, 5, 3, 1, 2, 3, 4, 5: min delta -2, adjusted deltas packed with a
+        # bit width of 2 in a padded 32 value miniblock.
+        data = array.array('B', [0x80, 0x01, 4, 8, 14, 3, 2, 0, 0, 0,
+                                 0xC0, 0x3F, 0, 0, 0, 0, 0, 0]).tobytes()
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(data + b"tail")
+        out = reader.read_delta_binary_packed(fo, Type.INT64)
+        self.assertEquals('int64', out.dtype.name)
+        self.assertEquals([7, 5, 3, 1, 2, 3, 4, 5], out.tolist())
+        self.assertEquals(b"tail", fo.read())
+
+
+class TestDeltaByteArray(unittest.TestCase):
+
+    @staticmethod
+    def _constant(first, count):
+        # DELTA_BINARY_PACKED run of count values starting at first, delta 0
+        return array.array('B', [0x80, 0x01, 4, count, first * 2, 0,
+                                 0, 0, 0, 0]).tobytes()
+
+    def testDeltaLength(self):
+        data = self._constant(3, 2) + b"foobar"
+        reader = parquet.encoding.Encoding(1)
+        out = reader.read_delta_length_byte_array(BytesIO(data))
+        self.assertEquals([b"foo", b"bar"], out.tolist())
+
+    def testDeltaByteArray(self):
+        # prefix lengths 0, 3, 3 and suffixes "abc", "de", "fg"
+        prefixes = array.array('B', [0x80, 0x01, 4, 3, 0, 0, 2, 0, 0, 0,
+                                     3, 0, 0, 0, 0, 0, 0, 0]).tobytes()
+        suffix_lengths = array.array('B', [0x80, 0x01, 4, 3, 6, 1, 1, 0, 0, 0,
+                                           2, 0, 0, 0]).tobytes()
+        data = prefixes + suffix_lengths + b"abcdefg"
+        reader = parquet.encoding.Encoding(1)
+        fo = BytesIO(data + b"tail")
+        out = reader.read_delta_byte_array(fo)
+        self.assertEquals([b"abc", b"abcde", b"abcfg"], out.tolist())
+        self.assertEquals(b"tail", fo.read())
+
+
 class TestVarInt(unittest.TestCase):
 
     def testSingleByte(self):
@@ -111,7 +269,7 @@ class TestBitPacked(unittest.TestCase):
 
     def testFromExample(self):
         raw_data_in = [0b10001000, 0b11000110, 0b11111010]
-        encoded_bitstring = array.array('B', raw_data_in).tostring()
+        encoded_bitstring = array.array('B', raw_data_in).tobytes()
         fo = BytesIO(encoded_bitstring)
         count = 3 << 1
         reader = parquet.encoding.Encoding(3)
@@ -119,15 +277,47 @@ class TestBitPacked(unittest.TestCase):
         self.assertEquals([x for x in range(8)], res.tolist())
 
 
+    def testAllWidths(self):
+        for width in range(1, 33):
+            values = [(i * 2654435761) & ((1 << width) - 1) for i in range(19)]
+            packed = 0
+            for i, v in enumerate(values):
+                packed |= v << (i * width)
+            num_groups = (len(values) + 7) // 8
+            data = packed.to_bytes(num_groups * width, 'little')
+            reader = parquet.encoding.Encoding(width)
+            fo = BytesIO(struct.pack("<B", (num_groups << 1) | 1) + data)
+            out = reader.read_rle_bit_packed_hybrid(fo, len(data) + 1,
+                                                    len(values))
+            expected = [v - (1 << 32) if v >= 1 << 31 else v for v in values]
+            self.assertEquals(expected, out.tolist(), width)
+
+    def testWideRle(self):
+        reader = parquet.encoding.Encoding(20)
+        fo = BytesIO(struct.pack("<B", 4 << 1) + (0xABCDE).to_bytes(3, 'little'))
+        out = reader.read_rle_bit_packed_hybrid(fo, 4)
+        self.assertEquals([0xABCDE] * 4, out.tolist())
+
+
 class TestBitPackedDeprecated(unittest.TestCase):
 
     def testFromExample(self):
         encoded_bitstring = array.array(
-            'B', [0b00000101, 0b00111001, 0b01110111]).tostring()
+            'B', [0b00000101, 0b00111001, 0b01110111]).tobytes()
         fo = BytesIO(encoded_bitstring)
         reader = parquet.encoding.Encoding(3)
         res = reader.read_bitpacked_deprecated(fo, 3, 8)
-        self.assertEquals([x for x in range(8)], res)
+        self.assertEquals([x for x in range(8)], res.tolist())
+
+    def testWidths(self):
+        for width in [1, 2, 5, 8, 13, 32]:
+            values = [(i * 7919) % (1 << width) for i in range(21)]
+            bits = "".join(format(v, "0{0}b".format(width)) for v in values)
+            bits += "0" * (-len(bits) % 8)
+            data = int(bits, 2).to_bytes(len(bits) // 8, "big")
+            reader = parquet.encoding.Encoding(width)
+            res = reader.read_bitpacked_deprecated(BytesIO(data), len(data), 21)
+            self.assertEquals(values, res.tolist())
 
 
 class TestWidthFromMaxInt(unittest.TestCase):
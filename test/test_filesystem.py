@@ -0,0 +1,148 @@
+import http.server
+import os
+import re
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from parquet import BlockCache, CachingFileSystem, FooterCache
+from parquet import HTTPFileSystem, LocalFileSystem, ParquetReader
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves test-data with range requests, after the server's latency."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _file(self):
+        path = os.path.join('test-data', os.path.basename(self.path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def do_HEAD(self):
+        with self.server.lock:
+            self.server.heads += 1
+        data = self._file()
+        if data is not None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.headers.get('Range'))
+            server.connections.add(self.client_address)
+        time.sleep(server.latency)
+        data = self._file()
+        if data is None:
+            return
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            data = data[start:end + 1]
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class TestHTTPFileSystem(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), RangeRequestHandler)
+        self.server.latency = 0
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.heads = 0
+        self.server.connections = set()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        self.base = 'http://127.0.0.1:{0}/'.format(self.server.server_port)
+        self.fs = HTTPFileSystem(max_connections=4)
+
+    def tearDown(self):
+        self.fs.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_read_ranges(self):
+        url = self.base + 'nation.impala.parquet'
+        with open('test-data/nation.impala.parquet', 'rb') as f:
+            expected = f.read()
+        self.assertEqual(len(expected), self.fs.size(url))
+        ranges = [(len(expected) - 8, 8), (0, 4), (100, 50)]
+        self.assertEqual([expected[o:o + n] for o, n in ranges],
+                         [bytes(v) for v in self.fs.read_ranges(url, ranges)])
+        # the file is smaller than the gap, so that is one request
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_connections_are_reused(self):
+        fs = HTTPFileSystem(max_connections=1, coalesce_gap=0)
+        try:
+            fs.read_ranges(self.base + 'nation.impala.parquet',
+                           [(0, 4), (100, 4), (200, 4)])
+        finally:
+            fs.close()
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(1, len(self.server.connections))
+
+    def test_concurrent_ranges(self):
+        self.server.latency = 0.3
+        fs = HTTPFileSystem(max_connections=4, coalesce_gap=0)
+        start = time.time()
+        try:
+            fs.read_ranges(self.base + 'nation.impala.parquet',
+                           [(0, 4), (100, 4), (200, 4), (300, 4)])
+        finally:
+            fs.close()
+        self.assertLess(time.time() - start, 4 * 0.3)
+
+    def test_parquet_reader(self):
+        self.server.latency = 0.01
+        for name in ['nation.impala.parquet', 'datapage_v2.snappy.parquet']:
+            expected = ParquetReader('test-data/' + name).read()
+            dataframe = ParquetReader(self.base + name, fs=self.fs).read()
+            pd.testing.assert_frame_equal(dataframe, expected)
+
+    def test_open_requests(self):
+        url = self.base + 'nation.impala.parquet'
+        ParquetReader(url, fs=self.fs, footer_cache=None)
+        # the size and version, then the footer with the end of the file
+        self.assertEqual((1, 1), (self.server.heads,
+                                  len(self.server.requests)))
+
+    def test_cached_open_requests(self):
+        url = self.base + 'nation.impala.parquet'
+        fs = CachingFileSystem(self.fs, BlockCache(), version_ttl=60)
+        for _ in range(2):
+            ParquetReader(url, fs=fs, footer_cache=FooterCache()).read()
+        self.assertEqual(1, self.server.heads)
+
+    def test_missing_file(self):
+        with self.assertRaises(IOError):
+            self.fs.read_ranges(self.base + 'missing.parquet', [(0, 4)])
+
+
+class TestLocalFileSystem(unittest.TestCase):
+
+    def test_read_ranges(self):
+        fs = LocalFileSystem()
+        path = 'test-data/nation.impala.parquet'
+        with open(path, 'rb') as f:
+            expected = f.read()
+        self.assertEqual(len(expected), fs.size(path))
+        ranges = [(10, 5), (0, 4)]
+        self.assertEqual([expected[10:15], expected[:4]],
+                         [bytes(v) for v in fs.read_ranges(path, ranges)])
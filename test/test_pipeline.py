@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+
+import pandas as pd
+
+from parquet import LocalFileSystem, ParquetReader
+
+
+class SlowFileSystem(LocalFileSystem):
+
+    def read_ranges(self, path, ranges):
+        time.sleep(0.01)
+        return super(SlowFileSystem, self).read_ranges(path, ranges)
+
+
+class TestReadPipeline(unittest.TestCase):
+
+    def test_read(self):
+        for name in ['nation.impala.parquet', 'datapage_v2.snappy.parquet',
+                     'nested.parquet', 'nullable.parquet', 'delta.parquet',
+                     'categories.parquet']:
+            expected = ParquetReader('test-data/' + name).read()
+            pipeline = ParquetReader('test-data/' + name).pipeline()
+            pd.testing.assert_frame_equal(pipeline.read(), expected)
+
+    def test_row_groups(self):
+        reader = ParquetReader('test-data/categories.parquet')
+        frames = list(reader.pipeline(columns=['n']))
+        self.assertEqual([rg.num_rows for rg in reader._rg],
+                         [len(frame) for frame in frames])
+        expected = ParquetReader('test-data/categories.parquet').read(
+            columns=['n'])
+        pd.testing.assert_frame_equal(
+            pd.concat(frames, ignore_index=True), expected)
+
+    def test_categorical(self):
+        expected = ParquetReader('test-data/strings.dict.parquet').read(
+            categorical=True)
+        reader = ParquetReader('test-data/strings.dict.parquet')
+        pd.testing.assert_frame_equal(
+            reader.pipeline(categorical=True).read(), expected)
+
+    def test_backpressure(self):
+        reader = ParquetReader('test-data/categories.parquet',
+                               fs=SlowFileSystem())
+        pipeline = reader.pipeline(queue_size=1, decompress_workers=1,
+                                   decode_workers=1)
+        frames = iter(pipeline)
+        next(frames)
+        time.sleep(0.2)
+        for depth, max_depth in pipeline.queue_depths().values():
+            self.assertLessEqual(depth, 1)
+            self.assertLessEqual(max_depth, 1)
+        frames.close()
+
+    def test_failure(self):
+        # the footer is modified, so it mustn't be shared through the cache
+        reader = ParquetReader('test-data/nation.impala.parquet',
+                               footer_cache=None)
+        col = reader._rg[0].columns[0]
+        col.meta_data.total_compressed_size = 3
+        threads = threading.active_count()
+        with self.assertRaises(Exception):
+            reader.pipeline().read()
+        # the stages have stopped
+        self.assertEqual(threads, threading.active_count())
+
+    def test_unknown_column(self):
+        reader = ParquetReader('test-data/nation.impala.parquet')
+        with self.assertRaises(ValueError):
+            reader.pipeline(columns=['missing'])
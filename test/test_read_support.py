@@ -78,7 +78,8 @@ class TestCompatibility(unittest.TestCase):
     nation_csv = os.path.join(td, "nation.csv")
     parquets = ["gzip-nation.impala.parquet", "nation.dict.parquet",
                 "nation.impala.parquet", "nation.plain.parquet",
-                "snappy-nation.impala.parquet"]
+                "snappy-nation.impala.parquet", "zstd-nation.parquet",
+                "lz4-nation.parquet", "brotli-nation.parquet"]
 
     def _compare_data(self, expected_data, actual_data):
         assert expected_data == actual_data
@@ -174,3 +175,14 @@ class TestCompatibility(unittest.TestCase):
             self._test_file_csv(parquet_file, csv_file)
             self._test_file_json(parquet_file, csv_file)
             self._test_file_custom(parquet_file, csv_file)
+
+    def test_parquet_reader(self):
+        with open(self.nation_csv, 'r') as f:
+            expected_data = list(csv.reader(f, delimiter='|'))
+        for p in self.parquets:
+            reader = parquet.ParquetReader(os.path.join(self.td, p))
+            for dataframe in [reader.read(), reader.pipeline().read()]:
+                actual_data = [[v.decode('utf-8') if isinstance(v, bytes)
+                                else str(v) for v in row]
+                               for row in dataframe.itertuples(index=False)]
+                self._compare_data(expected_data, actual_data)
@@ -1,4 +1,9 @@
-from parquet import ParquetReader
+import decimal
+
+import pandas as pd
+
+from parquet import LocalFileSystem, ParquetMain, ParquetReader, main
+from parquet.filesystem import coalesce_ranges
 
 
 def test_int_bool_dataset():
@@ -10,3 +15,303 @@ def test_int_bool_dataset():
     assert dataframe['bool'].tolist()[:6] == [
         False, True, False, False, True, True]
     assert dataframe.shape == (24, 2)
+
+
+def test_nation_dataset():
+    reader = ParquetReader('test-data/nation.impala.parquet')
+    dataframe = reader.read()
+    assert dataframe.shape == (25, 4)
+    assert dataframe['n_nationkey'].tolist() == list(range(25))
+    # n_name has no UTF8 annotation, so it stays binary
+    assert dataframe['n_name'].tolist()[:2] == [b'ALGERIA', b'ARGENTINA']
+
+
+def test_strings_dataset():
+    for name in ['strings.plain.parquet', 'strings.dict.parquet']:
+        reader = ParquetReader('test-data/' + name)
+        dataframe = reader.read()
+        assert dataframe['name'].tolist()[2:] == [u'w\xf6rld', u'', u'parquet']
+        assert dataframe['name'].isnull().tolist()[:2] == [False, True]
+        assert dataframe['raw'].tolist() == [
+            b'\x00\xff', b'ab', None, b'', b'\x80']
+
+
+def test_categorical():
+    reader = ParquetReader('test-data/categories.parquet')
+    dataframe = reader.read(categorical=['city'])
+    city = dataframe['city']
+    assert city.dtype == 'category'
+    # the two row groups have different dictionaries
+    assert sorted(city.cat.categories) == ['lima', 'oslo', 'rome']
+    assert city.tolist()[:4] == ['oslo', 'rome', 'oslo', 'lima']
+    assert city.isnull().tolist() == [False] * 4 + [True, False]
+    assert dataframe['n'].dtype == 'int64'
+
+    dataframe = ParquetReader('test-data/categories.parquet').read(
+        categorical=True)
+    assert dataframe['n'].dtype == 'category'
+    assert dataframe['n'].tolist() == [1, 2, 1, 3, 2, 1]
+
+
+def test_delta_binary_packed():
+    dataframe = ParquetReader('test-data/delta.parquet').read()
+    assert dataframe.shape == (1000, 5)
+    assert dataframe['id'].tolist() == [10**12 + 7 * i for i in range(1000)]
+    assert (dataframe['ts'].diff()[1:] >= 0).all()
+    assert dataframe['wide'].abs().max() > 2 ** 60
+    assert dataframe['opt'].dtype == 'Int64'
+    assert dataframe['opt'].isnull().tolist()[:8] == [True] + [False] * 6 + [True]
+    assert dataframe['opt'][1:7].tolist() == dataframe['small'][1:7].tolist()
+
+
+def test_delta_byte_arrays():
+    dataframe = ParquetReader('test-data/delta_strings.parquet').read()
+    urls = sorted('https://example.com/%s/%d' % (p, i)
+                  for p in ['a', 'api/v1', 'static'] for i in range(150))
+    for name in ['url', 'key']:
+        column = dataframe[name]
+        assert column.isnull().sum() == 9
+        assert column[~column.isnull()].tolist() == [
+            u for i, u in enumerate(urls) if i % 50 != 3]
+
+
+def test_data_page_v2():
+    for name in ['datapage_v2.parquet', 'datapage_v2.snappy.parquet']:
+        dataframe = ParquetReader('test-data/' + name).read()
+        assert dataframe['id'].tolist() == list(range(300))
+        assert dataframe['opt'].dtype == 'Int64'
+        assert dataframe['opt'].isnull().tolist() == [
+            i % 7 == 0 for i in range(300)]
+        assert dataframe['opt'].dropna().tolist() == [
+            i * 3 for i in range(300) if i % 7]
+        # city is RLE_DICTIONARY encoded
+        city = dataframe['city']
+        assert city.isnull().tolist() == [i % 11 == 0 for i in range(300)]
+        assert city[city.notnull()].tolist() == [
+            ['oslo', 'rome', 'lima'][i % 3] for i in range(300) if i % 11]
+
+
+def test_rle_booleans():
+    # written by pyarrow with data_page_version='2.0', which encodes
+    # booleans as RLE
+    dataframe = ParquetReader('test-data/boolean_rle_v2.parquet').read()
+    assert dataframe['r'].dtype == 'bool'
+    assert dataframe['r'].tolist() == [i % 5 == 1 for i in range(100)]
+    assert dataframe['b'].dtype == 'boolean'
+    assert dataframe['b'].isnull().tolist() == [i % 7 == 0
+                                                for i in range(100)]
+    assert dataframe['b'].dropna().tolist() == [i % 3 == 0
+                                                for i in range(100) if i % 7]
+
+
+def test_nullable_dtypes():
+    dataframe = ParquetReader('test-data/nullable.parquet').read()
+    assert dataframe.dtypes.tolist() == [
+        'Int64', 'Int64', 'Float64', 'Float64', 'boolean', 'UInt8']
+    for name in dataframe.columns:
+        assert dataframe[name].isnull().tolist() == [
+            i % 4 == 1 for i in range(20)]
+    assert dataframe['i32'].tolist()[:3] == [-5, pd.NA, -3]
+    assert dataframe['f64'].dropna().tolist()[:3] == [0.0, 0.5, 0.75]
+    assert dataframe['flag'].dropna().tolist()[:3] == [True, False, True]
+    assert dataframe['u8'].dropna().tolist()[:3] == [250, 252, 253]
+
+
+def test_nested_dataset():
+    for name in ['nested.parquet', 'nested_v2.parquet']:
+        dataframe = ParquetReader('test-data/' + name).read()
+        assert dataframe.shape == (200, 7)
+        assert dataframe['ints.list.element'].tolist()[:5] == [
+            [1, 2, 3], None, [], [4, pd.NA], [5]]
+        assert dataframe['nested.list.element.list.element'].tolist()[:5] == [
+            [['a', 'b'], []], None, [None, ['c']], [], [['d']]]
+        assert dataframe['st.b.list.element'].tolist()[:5] == [
+            ['x', 'y'], None, None, [], ['z']]
+        assert dataframe['mp.key_value.key'].tolist()[:5] == [
+            ['k1', 'k2'], None, [], ['k3'], ['k4']]
+        assert dataframe['st.a'].dtype == 'Int64'
+
+        # records never straddle a read
+        reader = ParquetReader('test-data/' + name)
+        parts = [reader.read(rows=33) for _ in range(7)]
+        assert sum(len(p) for p in parts) == 200
+        assert parts[1]['ints.list.element'].tolist()[:2] == [[4, pd.NA], [5]]
+
+
+def test_decimals():
+    # DECIMAL(9, 2) stored as INT32 and DECIMAL(18, 4) stored as INT64
+    reader = ParquetReader('test-data/decimals_int.parquet')
+    dataframe = reader.read()
+    assert dataframe['d9'].tolist()[:4] == [1.25, -3.5, pd.NA, -0.01]
+    assert dataframe['d18'].tolist()[1] == -1.0001
+
+    dataframe = ParquetReader('test-data/decimals_int.parquet').read(
+        unscaled_decimals=True)
+    assert dataframe['d9'].dtype == 'Int64'
+    assert dataframe['d18'].tolist()[:2] == [123456789012345678, -10001]
+
+
+def test_temporal_dataset():
+    dataframe = ParquetReader('test-data/temporal.parquet').read()
+    for name in ['date', 'tsms', 'tsus']:
+        assert dataframe[name].dtype == 'datetime64[ns]'
+        assert dataframe[name].isnull().tolist() == [False] * 3 + [True] + [
+            False] * 6
+    assert dataframe['date'][1] == pd.Timestamp('1962-09-27')
+    assert dataframe['tsms'][0] == pd.Timestamp('1969-12-31 23:59:59.123')
+    assert dataframe['tsus'][1] == pd.Timestamp('1971-02-04 23:59:59.123457')
+
+
+def test_int96_timestamps():
+    dataframe = ParquetReader('test-data/int96.parquet').read()
+    # the spark schema in the footer only marks ts as a timestamp
+    assert dataframe['ts'].dtype == 'datetime64[ns]'
+    assert dataframe['ts'][0] == pd.Timestamp('1969-12-31 23:59:59.123456')
+    assert dataframe['ts'][9] == pd.Timestamp('1979-11-09 23:59:59.123465')
+    assert pd.isnull(dataframe['ts'][3])
+    assert dataframe['other'][0] == b'(#\x10]\x94N\x00\x00\x9bK%\x00'
+    assert dataframe['other'][6] is None
+
+
+def test_int96_read_past_end():
+    reader = ParquetReader('test-data/int96.parquet')
+    reader.read()
+    dataframe = reader.read()
+    assert dataframe.shape == (0, 2)
+    assert dataframe['ts'].dtype == 'datetime64[ns]'
+
+
+def test_fixed_len_byte_array():
+    ids = [None if i % 4 == 3 else bytes([i, 255 - i]) * 7 + b'\x00\x00'
+           for i in range(40)]
+    dataframe = ParquetReader('test-data/fixed.parquet').read()
+    # trailing null bytes are kept
+    assert dataframe['id'].tolist() == ids
+    assert dataframe['tag'].tolist() == [ids[i % 3] for i in range(40)]
+
+
+def test_fixed_len_decimals():
+    dataframe = ParquetReader('test-data/decimals.parquet').read()
+    assert dataframe['d9'].tolist()[:5] == [1.25, -3.5, pd.NA, -0.01, 2.56]
+    assert dataframe['d18'].tolist()[5] == 0.0256
+    assert dataframe['d30'].tolist()[:3] == [
+        decimal.Decimal('1234567890123456789012345.12345'),
+        decimal.Decimal('-99999.00001'), None]
+
+
+def test_max_workers():
+    for name in ['datapage_v2.snappy.parquet', 'nested.parquet',
+                 'strings.dict.parquet', 'nullable.parquet']:
+        expected = ParquetReader('test-data/' + name).read()
+        reader = ParquetReader('test-data/' + name, max_workers=4)
+        pd.testing.assert_frame_equal(reader.read(), expected)
+        reader.close()
+
+
+def test_max_workers_rows():
+    expected = ParquetReader('test-data/datapage_v2.parquet').read()
+    reader = ParquetReader('test-data/datapage_v2.parquet', max_workers=4)
+    first = reader.read(rows=100)
+    rest = reader.read()
+    assert len(first) == 100
+    pd.testing.assert_frame_equal(
+        pd.concat([first, rest], ignore_index=True), expected)
+
+
+def test_max_workers_categorical():
+    reader = ParquetReader('test-data/strings.dict.parquet', max_workers=2)
+    expected = ParquetReader('test-data/strings.dict.parquet').read(
+        categorical=True)
+    pd.testing.assert_frame_equal(reader.read(categorical=True), expected)
+
+
+def test_mmap():
+    for name in ['nation.plain.parquet', 'snappy-nation.impala.parquet',
+                 'datapage_v2.parquet', 'nested.parquet', 'int96.parquet',
+                 'delta_strings.parquet']:
+        expected = ParquetReader('test-data/' + name).read()
+        reader = ParquetReader('test-data/' + name, mmap=True)
+        pd.testing.assert_frame_equal(reader.read(), expected)
+        reader.close()
+
+
+class CountingFileSystem(LocalFileSystem):
+    """Counts the read calls made on the files it opens."""
+
+    def __init__(self):
+        super(CountingFileSystem, self).__init__()
+        self.reads = []
+
+    def open(self, path, mode='rb'):
+        fileobj = super(CountingFileSystem, self).open(path, mode)
+        reads = self.reads
+
+        class CountingFile(object):
+            def read(self, size=-1):
+                reads.append(size)
+                return fileobj.read(size)
+
+            def __getattr__(self, name):
+                return getattr(fileobj, name)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                fileobj.close()
+
+        return CountingFile()
+
+
+def test_empty_row_group():
+    # the second of three row groups holds no rows
+    for categorical in [False, True]:
+        dataframe = ParquetReader('test-data/empty_row_group.parquet').read(
+            categorical=categorical)
+        assert dataframe['s'].tolist() == [u'a', u'b', u'c', u'a', u'b']
+        assert dataframe['n'].tolist() == [1, 2, 3, 1, 2]
+    reader = ParquetReader('test-data/empty_row_group.parquet')
+    frames = list(reader.pipeline())
+    assert [len(f) for f in frames] == [3, 0, 2]
+
+
+def test_coalesce_ranges():
+    assert coalesce_ranges([(100, 10), (0, 50), (60, 20)], 10) == [
+        (0, 80, [1, 2]), (100, 10, [0])]
+    assert coalesce_ranges([(0, 50), (10, 5)], 0) == [(0, 50, [0, 1])]
+
+
+def test_coalesced_column_chunks():
+    fs = CountingFileSystem()
+    reader = ParquetReader('test-data/nation.plain.parquet', fs=fs)
+    footer_reads = len(fs.reads)
+    dataframe = reader.read(rows=10)
+    # every column chunk of the row group in a single read
+    assert len(fs.reads) == footer_reads + 1
+    rest = reader.read()
+    assert len(fs.reads) == footer_reads + 1
+    expected = ParquetReader('test-data/nation.plain.parquet').read()
+    pd.testing.assert_frame_equal(
+        pd.concat([dataframe, rest], ignore_index=True), expected)
+
+
+def test_footer_in_one_read():
+    fs = CountingFileSystem()
+    reader = ParquetReader('test-data/nation.impala.parquet', fs=fs,
+                           footer_cache=None)
+    assert len(fs.reads) == 1
+    assert reader._footer.num_rows == 25
+
+
+def test_footer_larger_than_tail(monkeypatch):
+    expected = ParquetMain().read_footer('test-data/nation.impala.parquet')
+    monkeypatch.setattr(main, 'FOOTER_READ_SIZE', 16)
+    fs = CountingFileSystem()
+    reader = ParquetReader('test-data/nation.impala.parquet', fs=fs,
+                           footer_cache=None)
+    # the footer is read again after the tail
+    assert fs.reads[0] == 16
+    assert len(fs.reads) == 2
+    assert reader._footer == expected
+    with open('test-data/nation.impala.parquet', 'rb') as f:
+        assert ParquetMain().read_footer(f.name, f) == expected